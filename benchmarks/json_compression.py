@@ -0,0 +1,93 @@
+"""Compare JSON encode time and bytes on the wire for the large list endpoints.
+
+For each endpoint, fetches the full response once and then times DRF's
+standard library JSONRenderer against FastJSONRenderer on the same data.
+It also reports the response size as sent with no encoding, gzip and
+(when the brotli package is installed) brotli, as produced by
+CompressionMiddleware. Runs against the database in settings, so seed it
+first (e.g. ``manage.py seed_ratings``) for meaningful numbers.
+
+    python benchmarks/json_compression.py --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'professor_rating.settings')
+
+ENDPOINTS = ('module-instances/', 'professor-ratings/', 'api/module-instances/', 'api/professors/')
+
+
+def benchmark_client():
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    user, created = User.objects.get_or_create(username='benchmark')
+    if created:
+        user.set_unusable_password()
+        user.save()
+    client = APIClient(HTTP_HOST='localhost')
+    client.force_authenticate(user=user)
+    return client
+
+
+def time_render(renderer, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = renderer.render(data, 'application/json')
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), body
+
+
+def wire_size(client, path, encoding):
+    started = time.perf_counter()
+    response = client.get(path, HTTP_ACCEPT_ENCODING=encoding)
+    elapsed = time.perf_counter() - started
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    return len(content), response.get('Content-Encoding', 'identity'), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoint', choices=ENDPOINTS, action='append', help="Defaults to all of them")
+    parser.add_argument('--repeat', type=int, default=10, help="Encodes per renderer; the median is reported")
+    args = parser.parse_args()
+
+    client = benchmark_client()
+    from rest_framework.renderers import JSONRenderer
+
+    from rating_professors import compression, renderers
+
+    if renderers.orjson is None:
+        print("orjson is not installed: FastJSONRenderer falls back to the standard library")
+    encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+
+    for endpoint in args.endpoint or ENDPOINTS:
+        path = f'/api/{endpoint}'
+        response = client.get(path, HTTP_ACCEPT_ENCODING='identity')
+        if response.status_code != 200:
+            print(f"{path}: HTTP {response.status_code}, skipped")
+            continue
+        data = response.data
+        rows = len(data) if isinstance(data, list) else 1
+
+        standard, expected = time_render(JSONRenderer(), data, args.repeat)
+        fast, body = time_render(renderers.FastJSONRenderer(), data, args.repeat)
+        print(f"\n{path} ({rows} rows)")
+        print(f"  encode  json {standard * 1000:>9.1f} ms   fast {fast * 1000:>9.1f} ms"
+              f"   {standard / max(fast, 1e-9):.1f}x{'' if body == expected else '   OUTPUT DIFFERS'}")
+        for encoding in encodings:
+            size, used, elapsed = wire_size(client, path, encoding)
+            print(f"  {used:<8} {size:>12,} bytes   {size / len(body):>6.1%}   request {elapsed * 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Hammer the production SQLite mode with concurrent rating writes.
+
+Creates a fresh database in a temporary directory, then has several
+processes submit ratings for the same professor at once through
+``rate-professor/`` and ``api/ratings/``, each user re-rating every
+module instance a few times. Afterwards it checks that every request
+succeeded, that the last rating of each user survived and that the
+stored totals match the Rating table. Exits non-zero on any lost write
+or lock error.
+
+    python benchmarks/sqlite_write_stress.py --processes 8 --users 40 --rounds 3
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'professor_rating.settings')
+
+ENDPOINTS = ('/api/rate-professor/', '/api/api/ratings/')
+
+
+def expected_rating(user_index, instance_index, round_index):
+    return (user_index + instance_index + round_index) % 5 + 1
+
+
+def setup_database(users, instances):
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from rating_professors.models import Module, ModuleInstance, Professor
+
+    call_command('migrate', verbosity=0)
+    professor = Professor.objects.create(name='Stress', email='stress@example.com', department='CS')
+    module = Module.objects.create(code='ST1', title='Stress')
+    instance_ids = []
+    for index in range(instances):
+        instance = ModuleInstance.objects.create(module=module, year=2000 + index, semester=1)
+        instance.professors.add(professor)
+        instance_ids.append(instance.id)
+    tokens = []
+    for index in range(users):
+        user = User.objects.create(username=f'stress{index}')
+        tokens.append(Token.objects.create(user=user).key)
+    return professor.id, instance_ids, tokens
+
+
+def worker(jobs):
+    import django
+    django.setup()
+    from django.test import Client
+
+    client = Client(HTTP_HOST='localhost')
+    statuses = Counter()
+    for endpoint, token, payload in jobs:
+        try:
+            response = client.post(
+                endpoint, payload, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {token}',
+            )
+            statuses[response.status_code] += 1
+        except Exception as exc:
+            statuses[f'{type(exc).__name__}: {exc}'] += 1
+    return statuses
+
+
+def verify(professor_id, expected):
+    from django.db.models import Count, Sum
+
+    from rating_professors.models import Professor, ProfessorModuleRating, Rating
+
+    problems = []
+    ratings = {(user, instance): rating for user, instance, rating in
+               Rating.objects.values_list('user__username', 'module_instance_id', 'rating')}
+    if ratings != expected:
+        lost = len(set(expected.items()) - set(ratings.items()))
+        problems.append(f"{lost} of {len(expected)} final ratings missing or stale")
+
+    totals = Rating.objects.aggregate(rating_sum=Sum('rating'), rating_count=Count('id'))
+    professor = Professor.objects.get(pk=professor_id)
+    if (professor.rating_sum, professor.rating_count) != (totals['rating_sum'], totals['rating_count']):
+        problems.append(f"professor totals {professor.rating_sum}/{professor.rating_count} "
+                        f"do not match ratings {totals['rating_sum']}/{totals['rating_count']}")
+    rollup = ProfessorModuleRating.objects.get(professor_id=professor_id)
+    if (rollup.rating_sum, rollup.rating_count) != (totals['rating_sum'], totals['rating_count']):
+        problems.append(f"module rollup {rollup.rating_sum}/{rollup.rating_count} "
+                        f"does not match ratings {totals['rating_sum']}/{totals['rating_count']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--instances', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_NAME'] = str(Path(tmp) / 'stress.sqlite3')
+        os.environ['SQLITE_PRODUCTION'] = 'True'
+        # A cache of its own, so no other server's entries or versions leak in.
+        os.environ['CACHE_DIR'] = str(Path(tmp) / 'cache')
+        professor_id, instance_ids, tokens = setup_database(args.users, args.instances)
+
+        jobs = [[] for _ in range(args.processes)]
+        expected = {}
+        for round_index in range(args.rounds):
+            for user_index, token in enumerate(tokens):
+                for instance_index, instance_id in enumerate(instance_ids):
+                    rating = expected_rating(user_index, instance_index, round_index)
+                    endpoint = ENDPOINTS[(user_index + round_index) % len(ENDPOINTS)]
+                    payload = {'professor': professor_id, 'module_instance': instance_id, 'rating': rating}
+                    # One process per user keeps each user's writes in order.
+                    jobs[user_index % args.processes].append((endpoint, token, payload))
+                    expected[(f'stress{user_index}', instance_id)] = rating
+
+        from django.db import connections
+        connections.close_all()
+        started = time.monotonic()
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            statuses = sum(pool.map(worker, jobs), Counter())
+        elapsed = time.monotonic() - started
+
+        requests_sent = sum(statuses.values())
+        print(f"{requests_sent} writes from {args.processes} processes in {elapsed:.2f}s "
+              f"({requests_sent / elapsed:.0f}/s): {dict(statuses)}")
+
+        problems = [f"{count} requests ended with {status}"
+                    for status, count in statuses.items() if status not in (200, 201)]
+        problems += verify(professor_id, expected)
+        connections.close_all()
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: no lost writes or lock errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compare read throughput of the WSGI and ASGI code paths.
+
+Starts one gunicorn worker serving the synchronous DRF views and one
+uvicorn worker serving the async views, drives each with the same number
+of concurrent clients for a fixed time, and prints requests per second
+and latency percentiles. Runs against the database in settings, so seed
+it first (e.g. ``manage.py seed_ratings``) for meaningful numbers.
+
+    python benchmarks/wsgi_vs_asgi.py --concurrency 64 --duration 10
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'professor_rating.settings')
+
+ENDPOINTS = {
+    'professor-ratings': ('professor-ratings/', 'async/professor-ratings/'),
+    'module-instances': ('module-instances/', 'async/module-instances/'),
+}
+
+
+def benchmark_token():
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+
+    user, created = User.objects.get_or_create(username='benchmark')
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return Token.objects.get_or_create(user=user)[0].key
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def drive(url, token, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        session.headers['Authorization'] = f'Token {token}'
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run(name, command, port, url, token, args):
+    server = subprocess.Popen(command, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        drive(url, token, args.concurrency, 1)  # warm up
+        latencies, errors = drive(url, token, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if len(latencies) < 2:
+        print(f"{name:<6} no successful requests ({errors} errors)")
+        return
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<6} {len(latencies) / args.duration:>9.1f} req/s"
+        f"  p50 {quantiles[49] * 1000:>7.1f} ms  p99 {quantiles[98] * 1000:>7.1f} ms"
+        f"  errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='professor-ratings')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=4, help="gunicorn threads for the WSGI worker")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    token = benchmark_token()
+    sync_path, async_path = ENDPOINTS[args.endpoint]
+    print(f"{args.endpoint}: {args.concurrency} concurrent clients for {args.duration:g}s, one worker each")
+
+    wsgi_port, asgi_port = args.port, args.port + 1
+    run('WSGI', [
+        sys.executable, '-m', 'gunicorn', 'professor_rating.wsgi:application',
+        '--workers', '1', '--threads', str(args.threads), '--bind', f'127.0.0.1:{wsgi_port}',
+    ], wsgi_port, f'http://127.0.0.1:{wsgi_port}/api/{sync_path}', token, args)
+    run('ASGI', [
+        sys.executable, '-m', 'uvicorn', 'professor_rating.asgi:application',
+        '--workers', '1', '--port', str(asgi_port), '--log-level', 'warning',
+    ], asgi_port, f'http://127.0.0.1:{asgi_port}/api/{async_path}', token, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,269 @@
 import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
 import requests
 import getpass
+import hashlib
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 
 #BASE_URL = "http://127.0.0.1:8000/api/"
-BASE_URL = "http://sc22yfml.pythonanywhere.com/api/"
+BASE_URL = os.environ.get("PROFESSOR_RATING_URL", "http://sc22yfml.pythonanywhere.com/api/")
+PAGE_SIZE = 200
+CACHE_DIR = os.environ.get(
+    "PROFESSOR_RATING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "professor_rating")
+)
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+# How long a request with a cached copy waits before falling back to it
+CACHE_TIMEOUT = 3
+CREDENTIALS_FILE = os.path.join(os.path.expanduser("~"), ".professor_rating_credentials.json")
+TIMEOUT = 30
+# Retried with exponential backoff; POSTs are not idempotent and never retried.
+# Read timeouts are not retried either: a slow server is not helped by more
+# requests, and cached reads fall back to the stored copy instead.
+RETRIES = Retry(
+    total=3,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+)
+
+JSON_OUTPUT = False
+USE_CACHE = True
+TIMINGS = []
+_connect_time = threading.local()
+
+
+# Connections that note how long they took to open (TCP and TLS), so the
+# timing report can split a request's latency into connect and server time.
+class TimedConnectionMixin:
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - started
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+def make_session(pool_size=10):
+    """One keep-alive session shared by every request the client makes."""
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=RETRIES)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = make_session()
+
+
+def api_request(method, url, **kwargs):
+    """Send a request through the shared session and record its timing."""
+    if not url.startswith(("http://", "https://")):
+        url = f"{BASE_URL}{url}"
+    kwargs.setdefault("timeout", TIMEOUT)
+    _connect_time.seconds = 0.0
+    started = time.perf_counter()
+    response = SESSION.request(method, url, **kwargs)
+    total = time.perf_counter() - started
+    connect = _connect_time.seconds
+    TIMINGS.append({
+        "method": method,
+        "url": response.url,
+        "status": response.status_code,
+        "connect": connect,
+        # Until the response headers arrived, minus opening the connection
+        "server": max(response.elapsed.total_seconds() - connect, 0.0),
+        "total": total,
+    })
+    return response
+
+
+def print_timing_report():
+    if not TIMINGS:
+        return
+    print(f"\n{'method':<6} {'status':>6} {'connect':>9} {'server':>9} {'total':>9}  url", file=sys.stderr)
+    for timing in TIMINGS:
+        print(
+            f"{timing['method']:<6} {timing['status']:>6} {timing['connect'] * 1000:>7.1f}ms "
+            f"{timing['server'] * 1000:>7.1f}ms {timing['total'] * 1000:>7.1f}ms  {timing['url']}",
+            file=sys.stderr,
+        )
+    total = sum(timing["total"] for timing in TIMINGS)
+    connects = sum(1 for timing in TIMINGS if timing["connect"])
+    print(f"{len(TIMINGS)} requests in {total * 1000:.1f}ms, {connects} new connections", file=sys.stderr)
+
+
+def print_json(data):
+    print(json.dumps(data, indent=2))
+
+
+def load_token():
+    try:
+        with open(CREDENTIALS_FILE) as f:
+            return json.load(f).get("token")
+    except (OSError, ValueError):
+        return None
+
+
+def save_token(token, username):
+    # Readable only by the current user, like ~/.netrc
+    fd = os.open(CREDENTIALS_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"token": token, "username": username}, f)
+
+
+def clear_token():
+    try:
+        os.remove(CREDENTIALS_FILE)
+    except OSError:
+        pass
+
+
+def get_token():
+    """The token stored by login, or one typed in when there is none."""
+    return load_token() or input("Enter your token: ")
+
+
+def cache_path(url, headers):
+    # One file per URL and user, so accounts never see each other's responses
+    user = headers.get("Authorization", "")
+    key = hashlib.sha256(f"{user}\n{url}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def load_cache_entry(path):
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        # Mark as recently used for eviction
+        os.utime(path)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache_entry(path, entry):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename, so concurrent readers never see half a file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        evict_cache()
+    except OSError:
+        pass
+
+
+def evict_cache(max_bytes=None):
+    """Delete least recently used entries until the cache fits in CACHE_MAX_BYTES."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for item in it:
+            if item.name.endswith(".json"):
+                stat = item.stat()
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def cached_get(url, headers, params=None):
+    """GET a JSON resource, revalidating any stored copy with the server.
+
+    A stored copy is also used when the server does not answer within
+    CACHE_TIMEOUT. Returns (response, data); data is None when the request
+    failed, and response is None when the stored copy was used unchecked.
+    """
+    if not USE_CACHE:
+        response = api_request("GET", url, headers=headers, params=params)
+        return response, response.json() if response.status_code == 200 else None
+
+    path = cache_path(requests.Request("GET", url, params=params).prepare().url, headers)
+    entry = load_cache_entry(path)
+
+    headers = dict(headers)
+    timeout = TIMEOUT
+    if entry:
+        timeout = CACHE_TIMEOUT
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = api_request("GET", url, headers=headers, params=params, timeout=timeout)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+        if not entry:
+            raise
+        print("Server did not respond in time, showing the cached copy", file=sys.stderr)
+        return None, entry["data"]
+
+    if response.status_code == 304 and entry:
+        return response, entry["data"]
+    if response.status_code != 200:
+        return response, None
+
+    data = response.json()
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if etag or last_modified:
+        save_cache_entry(path, {"etag": etag, "last_modified": last_modified, "data": data})
+    return response, data
+
+
+def get_all_pages(url, headers):
+    """Follow the server's cursor links and return (last response, rows).
+
+    rows is None when a page could not be fetched.
+    """
+    rows = []
+    params = {"page_size": PAGE_SIZE}
+    while url:
+        response, page = cached_get(url, headers, params)
+        if page is None:
+            return response, None
+        rows.extend(page["results"])
+        # The next link already carries the cursor and page size
+        url, params = page["next"], None
+    return response, rows
 
 def register_user():
     username = input("Enter username: ")
@@ -18,7 +278,7 @@ def register_user():
     }
 
     try:
-        response = requests.post(url, json=data)  
+        response = api_request("POST", url, json=data)
         response.raise_for_status()  
     except requests.exceptions.RequestException as e:
         print(f"Request failed: {e}")
@@ -42,9 +302,10 @@ def login_user():
        "username": username,
        "password": password
     }
-    response = requests.post(url, json = data)
+    response = api_request("POST", url, json = data)
     if response.status_code == 200:
        token = response.json().get("token")
+       save_token(token, username)
        print("Login Successful")
        return token
     else:
@@ -55,8 +316,9 @@ def login_user():
 def logout_user(token):
     url = f"{BASE_URL}logout/"
     headers = {"Authorization": f"Token {token}"}
-    response = requests.post(url, headers=headers)
+    response = api_request("POST", url, headers=headers)
     if response.status_code == 200:
+        clear_token()
         print("Logout Successful")
     else:
         print(f"Error: {response.json()}")
@@ -65,22 +327,24 @@ def logout_user(token):
 def list_module_instances(token):
     url = f"{BASE_URL}module-instances/"
     headers = {"Authorization": f"Token {token}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            print("\nModule Instances:")
+    try:
+        response, data = get_all_pages(url, headers)
+    except ValueError as e:
+        print(f"Error decoding JSON: {e}")
+        return
+
+    if data is not None and JSON_OUTPUT:
+        print_json(data)
+    elif data is not None:
+        print("\nModule Instances:")
+        print("-" * 50)
+        for instance in data:
+            print(f"Code: {instance['module_code']}")
+            print(f"Name: {instance['module_title']}")
+            print(f"Year: {instance['year']}")
+            print(f"Semester: {instance['semester']}")
+            print(f"Taught by: {', '.join([prof['name'] for prof in instance['professors']])}")
             print("-" * 50)
-            for instance in data:
-                print(f"Code: {instance['module_code']}")
-                print(f"Name: {instance['module_title']}")
-                print(f"Year: {instance['year']}")
-                print(f"Semester: {instance['semester']}")
-                print(f"Taught by: {', '.join([prof['name'] for prof in instance['professors']])}")
-                print("-" * 50)
-        except ValueError as e:
-            print(f"Error decoding JSON: {e}")
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
@@ -88,19 +352,21 @@ def list_module_instances(token):
 def view_professor_ratings(token):
     url = f"{BASE_URL}professor-ratings/"
     headers = {"Authorization": f"Token {token}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            print("\nProfessor Ratings:")
+    try:
+        response, data = get_all_pages(url, headers)
+    except ValueError as e:
+        print(f"Error decoding JSON: {e}")
+        return
+
+    if data is not None and JSON_OUTPUT:
+        print_json(data)
+    elif data is not None:
+        print("\nProfessor Ratings:")
+        print("-" * 50)
+        for professor in data:
+            print(f"Professor: {professor['name']} ({professor['id']})")
+            print(f"Average Rating: {'*' * professor['average_rating']}")
             print("-" * 50)
-            for professor in data:
-                print(f"Professor: {professor['name']} ({professor['id']})")
-                print(f"Average Rating: {'*' * professor['average_rating']}")
-                print("-" * 50)
-        except ValueError as e:
-            print(f"Error decoding JSON: {e}")
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
@@ -111,22 +377,24 @@ def view_average_rating(token):
     
     url = f"{BASE_URL}professor-module-rating/{professor_id}/{module_code}/"
     headers = {"Authorization": f"Token {token}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        try:
-            data = response.json()
-            print("\nAverage Rating:")
-            print("-" * 50)
-            print(f"Professor: {data['professor_name']} ({data['professor_id']})")
-            print(f"Module: {data['module_name']} ({data['module_code']})")
-            
-            # Convert average_rating to an integer
-            average_rating = int(round(data['average_rating']))
-            print(f"Average Rating: {'*' * average_rating}")
-            print("-" * 50)
-        except ValueError as e:
-            print(f"Error decoding JSON: {e}")
+    try:
+        response, data = cached_get(url, headers)
+    except ValueError as e:
+        print(f"Error decoding JSON: {e}")
+        return
+
+    if data is not None and JSON_OUTPUT:
+        print_json(data)
+    elif data is not None:
+        print("\nAverage Rating:")
+        print("-" * 50)
+        print(f"Professor: {data['professor_name']} ({data['professor_id']})")
+        print(f"Module: {data['module_name']} ({data['module_code']})")
+
+        # Convert average_rating to an integer
+        average_rating = int(round(data['average_rating']))
+        print(f"Average Rating: {'*' * average_rating}")
+        print("-" * 50)
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
@@ -138,48 +406,121 @@ def rate_professor(token):
     semester = input("Enter semester (1 or 2): ")
     rating = input("Enter rating (1-5): ")
     
-    # Fetch the module instance ID
-    url = f"{BASE_URL}module-instances/"
+    # The server resolves the module instance from its code, year and semester
+    url = f"{BASE_URL}rate-professor/by-code/"
     headers = {"Authorization": f"Token {token}"}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code != 200:
-        print(f"Error fetching module instances: {response.status_code} - {response.text}")
-        return
-    
-    module_instances = response.json()
-    module_instance_id = None
-    
-    for instance in module_instances:
-        if (
-            instance["module_code"] == module_code
-            and instance["year"] == int(year)
-            and instance["semester"] == int(semester)
-        ):
-            module_instance_id = instance["id"]
-            break
-    
-    if not module_instance_id:
-        print("Error: Module instance not found.")
-        return
-    
-    url = f"{BASE_URL}rate-professor/"
     data = {
         "professor": professor_id,
-        "module_instance": module_instance_id,
+        "module_code": module_code,
+        "year": year,
+        "semester": semester,
         "rating": rating
     }
-    
-    response = requests.post(url, json=data, headers=headers)
-    
-    if response.status_code == 201:
+
+    response = api_request("POST", url, json=data, headers=headers)
+
+    if response.status_code == 201 and JSON_OUTPUT:
+        print_json(response.json())
+    elif response.status_code == 201:
         print("Rating submitted successfully!")
     else:
         print(f"Error: {response.status_code} - {response.text}")
 
 
+#bulk
+def run_concurrently(rows, task, workers):
+    """Run task(row) on a bounded thread pool, yielding (row, future) as each one finishes.
+
+    Only a couple of rows per worker are read ahead, so any file size works.
+    """
+    rows = iter(rows)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for row in islice(rows, workers * 2 - len(in_flight)):
+                in_flight[pool.submit(task, row)] = row
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future
+
+
+def run_bulk(path, columns, task, workers):
+    """Run task over every row of a CSV file and stream the outcomes.
+
+    task(row) returns (ok, result). Results print as they arrive, one line
+    each (JSON lines with --json), followed by a summary on stderr.
+    """
+    global SESSION
+    SESSION = make_session(pool_size=workers)
+
+    started = time.perf_counter()
+    succeeded, errors = 0, Counter()
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = set(columns) - set(reader.fieldnames or [])
+        if missing:
+            print(f"Error: {path} is missing columns: {', '.join(sorted(missing))}")
+            return
+        rows = ({"line": reader.line_num, **row} for row in reader)
+        for row, future in run_concurrently(rows, task, workers):
+            try:
+                ok, result = future.result()
+            except requests.exceptions.RequestException as e:
+                ok, result = False, f"Request failed: {type(e).__name__}"
+            if ok:
+                succeeded += 1
+            else:
+                errors[result.split(" - ")[0]] += 1
+            if JSON_OUTPUT:
+                print(json.dumps({"line": row["line"], "ok": ok, "result": result}), flush=True)
+            else:
+                print(f"line {row['line']}: {'OK' if ok else 'Error'}: {result}", flush=True)
+
+    elapsed = time.perf_counter() - started
+    total = succeeded + sum(errors.values())
+    print(
+        f"{total} requests in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f}/s) with {workers} workers: "
+        f"{succeeded} succeeded, {sum(errors.values())} failed",
+        file=sys.stderr,
+    )
+    for error, count in errors.most_common():
+        print(f"  {count} x {error}", file=sys.stderr)
+
+
+def rate_professors_from_file(token, path, workers):
+    headers = {"Authorization": f"Token {token}"}
+
+    def rate(row):
+        data = {key: row[key] for key in ("professor", "module_code", "year", "semester", "rating")}
+        response = api_request("POST", f"{BASE_URL}rate-professor/by-code/", json=data, headers=headers)
+        if response.status_code == 201:
+            return True, f"Rated professor {row['professor']} {row['rating']}/5 for {row['module_code']}"
+        return False, f"{response.status_code} - {response.text}"
+
+    run_bulk(path, ("professor", "module_code", "year", "semester", "rating"), rate, workers)
+
+
+def average_ratings_from_file(token, path, workers):
+    headers = {"Authorization": f"Token {token}"}
+
+    def average(row):
+        url = f"{BASE_URL}professor-module-rating/{row['professor']}/{row['module_code']}/"
+        response, data = cached_get(url, headers)
+        if data is not None:
+            return True, data
+        return False, f"{response.status_code} - {response.text}"
+
+    run_bulk(path, ("professor", "module_code"), average, workers)
+
+
 def main():
+    global JSON_OUTPUT, USE_CACHE
     parser = argparse.ArgumentParser(description="Professor Rating Command-Line Client")
+    parser.add_argument("--json", action="store_true", help="Print responses as JSON")
+    parser.add_argument("--timing", action="store_true", help="Report connect and server time per request")
+    parser.add_argument("--no-cache", action="store_true", help="Neither use nor store cached responses")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     subparsers.add_parser("register", help="Register a new user")
@@ -192,34 +533,49 @@ def main():
 
     subparsers.add_parser("view", help="View professor ratings")
 
-    subparsers.add_parser("average", help="View average rating of a professor in a module")
+    average_parser = subparsers.add_parser("average", help="View average rating of a professor in a module")
+    average_parser.add_argument("--file", help="CSV of professor,module_code pairs to look up concurrently")
+    average_parser.add_argument("--workers", type=int, default=8, help="Concurrent requests with --file")
 
-    subparsers.add_parser("rate", help="Rate a professor for a module instance")
+    rate_parser = subparsers.add_parser("rate", help="Rate a professor for a module instance")
+    rate_parser.add_argument("--file", help="CSV of professor,module_code,year,semester,rating rows to submit concurrently")
+    rate_parser.add_argument("--workers", type=int, default=8, help="Concurrent requests with --file")
 
     args = parser.parse_args()
+    JSON_OUTPUT = args.json
+    USE_CACHE = not args.no_cache
+
+    try:
+        run_command(parser, args)
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed: {e}")
+    finally:
+        if args.timing:
+            print_timing_report()
+
 
+def run_command(parser, args):
     if args.command == "register":
         register_user()
     elif args.command == "login":
         token = login_user()
         if token:
-            # Store the token for future requests
+            # Stored for future requests, see CREDENTIALS_FILE
             print(f"Token: {token}")
     elif args.command == "logout":
-        token = input("Enter your token: ")
-        logout_user(token)
+        logout_user(get_token())
     elif args.command == "list":
-        token = input("Enter your token: ")
-        list_module_instances(token)
+        list_module_instances(get_token())
     elif args.command == "view":
-        token = input("Enter your token: ")
-        view_professor_ratings(token)
+        view_professor_ratings(get_token())
+    elif args.command == "average" and args.file:
+        average_ratings_from_file(get_token(), args.file, args.workers)
     elif args.command == "average":
-        token = input("Enter your token: ")
-        view_average_rating(token)
+        view_average_rating(get_token())
+    elif args.command == "rate" and args.file:
+        rate_professors_from_file(get_token(), args.file, args.workers)
     elif args.command == "rate":
-        token = input("Enter your token: ")
-        rate_professor(token)
+        rate_professor(get_token())
     else:
         parser.print_help()
 
@@ -24,10 +24,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before anything that reads or changes the response body.
+    'rating_professors.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'rating_professors.routers.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,11 +57,78 @@ WSGI_APPLICATION = 'professor_rating.wsgi.application'
 # Database
 DATABASES = {
     'default': {
+        'ENGINE': 'rating_professors.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+    # Read-only copy of default, kept up to date outside Django. Reads only
+    # go here when REPLICA_DATABASE_NAME is set.
+    'replica': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': os.environ.get('REPLICA_DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+}
+
+# Production SQLite mode for several worker processes writing at once:
+# WAL lets readers run alongside the single writer, connections are kept
+# open between requests, and writers wait up to the busy timeout for the
+# lock instead of failing straight away.
+if os.environ.get('SQLITE_PRODUCTION', 'False') == 'True':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 10,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 10000,
+                'mmap_size': 268435456,
+            },
+        },
+    })
+
+DATABASE_ROUTERS = ['rating_professors.routers.ReadReplicaRouter']
+READ_REPLICA_ALIAS = 'replica' if os.environ.get('REPLICA_DATABASE_NAME') else None
+# How long a user's reads stay on the primary after they write.
+READ_YOUR_WRITES_SECONDS = 5
+
+# Cache
+# Response caches are invalidated through a version token stored in the
+# cache, and management commands invalidate them from their own process,
+# so every process must share the backend. The default is file-based;
+# locmem is per process and only correct for a single-process server.
+# The file cache unpickles what it finds, so CACHE_DIR must be writable only
+# by the user the server runs as; that is why it is not under /tmp.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(CACHE_DIR, 'default')),
+        # Versioned entries are never served stale; the timeout only clears
+        # out entries of superseded versions. Version tokens never expire.
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Token -> user lookups for CachedTokenAuthentication. Revocation evicts
+    # the entry in this shared cache, so it reaches every worker at once;
+    # the timeout only bounds how long idle entries stay. On a per-process
+    # backend the lookups are not cached at all. A file cache hit still
+    # unpickles the entry (see test_token_cache_against_lookup), so in
+    # production point CACHE_BACKEND, CACHE_LOCATION and TOKEN_CACHE_LOCATION
+    # at Redis or Memcached; the file backend is the fallback that needs no
+    # server.
+    'tokens': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('TOKEN_CACHE_LOCATION', os.path.join(CACHE_DIR, 'tokens')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+# Runs the tests against empty caches of their own.
+TEST_RUNNER = 'rating_professors.test_runner.IsolatedCacheTestRunner'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,9 +161,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'rating_professors.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-}
\ No newline at end of file
+    # orjson when installed, DRF's standard library encoder otherwise.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rating_professors.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rating_professors.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Responses of at least this many bytes are gzip or brotli compressed.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
\ No newline at end of file
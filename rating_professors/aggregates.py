@@ -0,0 +1,85 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import RATINGS, invalidate
+from .models import Professor, ProfessorModuleRating, Rating
+
+
+def apply_rating_delta(professor_id, module_id, sum_delta, count_delta, initial=None):
+    """Shift the stored rating totals of a professor and its module rollup.
+
+    The deltas may be integers or SQL expressions. ``initial`` is the
+    (sum, count) a missing rollup row is created with; for integer deltas
+    that add ratings it defaults to the deltas themselves.
+    """
+    if isinstance(sum_delta, int) and isinstance(count_delta, int):
+        if not sum_delta and not count_delta:
+            return
+        if initial is None and count_delta > 0:
+            initial = (sum_delta, count_delta)
+
+    Professor.objects.filter(pk=professor_id).update(
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_count=F('rating_count') + count_delta,
+    )
+
+    module_ratings = ProfessorModuleRating.objects.filter(professor_id=professor_id, module_id=module_id)
+    updated = module_ratings.update(
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_count=F('rating_count') + count_delta,
+        updated_at=timezone.now(),
+    )
+    # A missing rollup row only needs creating for the first rating of the
+    # pair; updates and deletes against it come from a cascade that is
+    # removing the row anyway.
+    if updated or initial is None:
+        return
+    try:
+        with transaction.atomic():
+            ProfessorModuleRating.objects.create(
+                professor_id=professor_id, module_id=module_id,
+                rating_sum=initial[0], rating_count=initial[1],
+            )
+    except IntegrityError:
+        module_ratings.update(
+            rating_sum=F('rating_sum') + sum_delta,
+            rating_count=F('rating_count') + count_delta,
+            updated_at=timezone.now(),
+        )
+
+
+def rebuild_rating_aggregates(professor_ids=None):
+    """Recompute stored rating totals and module rollups from the Rating table.
+
+    Touches every professor unless ``professor_ids`` is given and returns
+    the number of professors updated.
+    """
+    ratings = Rating.objects.filter(professor=OuterRef('pk')).order_by().values('professor')
+    professors = Professor.objects.all()
+    rollups = ProfessorModuleRating.objects.all()
+    module_totals = Rating.objects.order_by().values('professor_id', module_id=F('module_instance__module_id'))
+    if professor_ids is not None:
+        professors = professors.filter(pk__in=professor_ids)
+        rollups = rollups.filter(professor_id__in=professor_ids)
+        module_totals = module_totals.filter(professor_id__in=professor_ids)
+
+    updated = professors.update(
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('pk')).values('total')), 0),
+    )
+
+    rollups.delete()
+    ProfessorModuleRating.objects.bulk_create(
+        (
+            ProfessorModuleRating(
+                professor_id=row['professor_id'], module_id=row['module_id'],
+                rating_sum=row['rating_sum'], rating_count=row['rating_count'],
+            )
+            for row in module_totals.annotate(rating_sum=Sum('rating'), rating_count=Count('pk')).iterator()
+        ),
+        batch_size=1000,
+    )
+    invalidate(RATINGS)
+    return updated
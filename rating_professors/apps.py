@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class RatingProfessorsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rating_professors'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
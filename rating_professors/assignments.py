@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import CATALOGUE, get_version
+from .models import ModuleInstance
+
+
+class AssignmentIndex:
+    """In-process LRU map of module instance id -> (module id, professor ids).
+
+    Entries are loaded lazily and dropped by the m2m_changed receivers. The
+    whole index is also discarded whenever the shared catalogue version
+    moves, which covers assignment changes made by other processes. As that
+    relies on a cache shared between processes, entries are also reloaded
+    once they are ``max_age`` seconds old, which bounds how long a change
+    can go unseen if the version is lost or the cache is per process.
+    """
+
+    def __init__(self, max_entries=10000, max_age=60):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, module_instance_ids):
+        """Return {id: (module_id, frozenset(professor_ids))} for the instances that exist."""
+        version = get_version(CATALOGUE)
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            for module_instance_id in set(module_instance_ids):
+                loaded_at, entry = self._entries.get(module_instance_id, (None, None))
+                if entry is None or now - loaded_at > self.max_age:
+                    missing.append(module_instance_id)
+                else:
+                    self._entries.move_to_end(module_instance_id)
+                    found[module_instance_id] = entry
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = {}
+            rows = ModuleInstance.objects.filter(pk__in=missing).values_list('id', 'module_id', 'professors__id')
+            for module_instance_id, module_id, professor_id in rows:
+                _, professor_ids = loaded.setdefault(module_instance_id, (module_id, set()))
+                if professor_id is not None:
+                    professor_ids.add(professor_id)
+            loaded = {key: (module_id, frozenset(ids)) for key, (module_id, ids) in loaded.items()}
+
+            with self._lock:
+                if version == self._version:
+                    self._entries.update((key, (now, entry)) for key, entry in loaded.items())
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def is_assigned(self, module_instance_id, professor_id):
+        entry = self.lookup([module_instance_id]).get(module_instance_id)
+        return entry is not None and professor_id in entry[1]
+
+    def invalidate(self, module_instance_ids=None):
+        with self._lock:
+            if module_instance_ids is None:
+                self._entries.clear()
+            else:
+                for module_instance_id in module_instance_ids:
+                    self._entries.pop(module_instance_id, None)
+
+    def stats(self):
+        return {
+            'assignment_hits': self.hits,
+            'assignment_misses': self.misses,
+            'assignment_entries': len(self._entries),
+        }
+
+
+assignment_index = AssignmentIndex()
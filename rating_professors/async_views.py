@@ -0,0 +1,105 @@
+"""Async versions of the read endpoints for ASGI deployments.
+
+These are plain Django async views rather than DRF APIViews, which only
+run synchronously: under ASGI they stay on the event loop, using the
+async ORM and async token authentication, instead of occupying a thread
+of the sync-to-async pool per request. Responses match the synchronous
+views, minus the ?stream and cursor pagination modes.
+"""
+from functools import wraps
+
+from django.db.models import Max
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .authentication import aauthenticate_token
+from .cache import CATALOGUE, RATINGS, aget_or_build, aget_version, version_time
+from .conditional import aconditional_response
+from .models import Module, ModuleInstance, Professor, ProfessorModuleRating, Rating
+from .serializers import ModuleInstanceSerializer
+from .views import ProfessorRatingsView
+
+
+def token_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aauthenticate_token(request)
+        if user is None:
+            response = JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@token_required
+async def professor_ratings(request):
+    last_updated = (await Rating.objects.aaggregate(last_updated=Max('updated_at')))['last_updated']
+    version = await aget_version(RATINGS)
+    validator = f"{version}:{last_updated}"
+    last_modified = max(filter(None, [last_updated, version_time(version)]))
+
+    async def build():
+        async def load():
+            return [
+                ProfessorRatingsView.professor_rating(professor)
+                async for professor in Professor.objects.values('id', 'name', 'rating_sum', 'rating_count')
+            ]
+
+        data, hit = await aget_or_build(RATINGS, 'professor-ratings', load)
+        return JsonResponse(data, safe=False, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+    return await aconditional_response(request, validator, last_modified, build)
+
+
+@require_GET
+@token_required
+async def professor_module_rating(request, professor_id, module_code):
+    module_rating = await ProfessorModuleRating.objects.select_related('professor', 'module').filter(
+        professor_id=professor_id, module__code=module_code
+    ).afirst()
+
+    def rating_response(professor, module, avg_rating):
+        return JsonResponse({
+            "professor_id": professor.id,
+            "professor_name": professor.name,
+            "module_code": module.code,
+            "module_name": module.title,
+            "average_rating": round(avg_rating, 1)
+        })
+
+    if module_rating is None:
+        try:
+            professor = await Professor.objects.aget(id=professor_id)
+            module = await Module.objects.aget(code=module_code)
+        except (Professor.DoesNotExist, Module.DoesNotExist):
+            raise Http404
+        return rating_response(professor, module, 0)
+
+    version = await aget_version(CATALOGUE)
+    validator = (
+        f"{version}:{module_rating.rating_sum}:"
+        f"{module_rating.rating_count}:{module_rating.updated_at}"
+    )
+    last_modified = max(module_rating.updated_at, version_time(version))
+
+    async def build():
+        return rating_response(module_rating.professor, module_rating.module, module_rating.average_rating)
+
+    return await aconditional_response(request, validator, last_modified, build)
+
+
+@require_GET
+@token_required
+async def module_instance_list(request):
+    last_id = (await ModuleInstance.objects.aaggregate(last_id=Max('id')))['last_id']
+    version = await aget_version(CATALOGUE)
+    validator = f"{version}:{last_id}"
+
+    async def build():
+        module_instances = [instance async for instance in ModuleInstance.objects.for_listing()]
+        return JsonResponse(ModuleInstanceSerializer(module_instances, many=True).data, safe=False)
+
+    return await aconditional_response(request, validator, version_time(version), build)
@@ -0,0 +1,75 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE = 'tokens'
+
+
+def _cache_key(key):
+    return f'rating_professors:token:{key}'
+
+
+def token_cache():
+    """The shared token cache, or None when it is per process.
+
+    Evicting a revoked token from one process's cache would leave every
+    other worker accepting it, so per-process caches are not used.
+    """
+    cache = caches[TOKEN_CACHE]
+    return None if isinstance(cache, LocMemCache) else cache
+
+
+def evict_token(key):
+    cache = token_cache()
+    if cache is not None:
+        cache.delete(_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that remembers token -> user lookups.
+
+    Entries live in the ``tokens`` cache, which sets the TTL and entry
+    bound and must be shared between processes. Deleting a token or saving
+    its user evicts the entry straight away (see signals.py), so logout and
+    deactivation are not delayed.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        cached = cache.get(_cache_key(key))
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(_cache_key(key), (user, token))
+        return user, token
+
+
+async def aauthenticate_token(request):
+    """Resolve an ``Authorization: Token <key>`` header without blocking the event loop.
+
+    Shares the cache with CachedTokenAuthentication. Returns the user, or
+    None when the header is missing, malformed or revoked.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+
+    cache = token_cache()
+    if cache is not None:
+        cached = await cache.aget(_cache_key(auth[1]))
+        if cached is not None:
+            return cached[0]
+
+    try:
+        token = await Token.objects.select_related('user').aget(key=auth[1])
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    if cache is not None:
+        await cache.aset(_cache_key(auth[1]), (token.user, token))
+    return token.user
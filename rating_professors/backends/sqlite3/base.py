@@ -0,0 +1,28 @@
+"""SQLite backend with per-connection PRAGMAs and BEGIN IMMEDIATE writes.
+
+OPTIONS may carry a ``pragmas`` dict that is applied to every new
+connection, e.g. ``{'journal_mode': 'WAL', 'synchronous': 'NORMAL'}``.
+Transactions opened while ``begin_immediate`` is set take the write lock
+up front (see rating_professors.transactions.write_transaction), so two
+writers queue on the busy timeout instead of one failing when it tries
+to upgrade a read lock.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,97 @@
+"""Versioned response caching on top of Django's cache framework.
+
+Cached entries are keyed on a version token that is replaced whenever the
+underlying data changes, so readers never see stale data and nothing
+relies on a TTL. The token lives in the cache itself, so every process
+that serves or invalidates, including management commands, must share the
+backend; the checks in checks.py warn about per-process ones.
+"""
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+RATINGS = 'ratings'
+CATALOGUE = 'catalogue'
+
+# Hit and miss counts of this process only; see CacheStatsView.
+_stats = Counter()
+
+
+def _version_key(namespace):
+    return f'rating_professors:version:{namespace}'
+
+
+def get_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Lost or never set: start a fresh version rather than reuse old entries.
+        version = bump_version(namespace)
+    return version
+
+
+async def aget_version(namespace):
+    version = await cache.aget(_version_key(namespace))
+    if version is None:
+        version = str(time.time_ns())
+        await cache.aset(_version_key(namespace), version, None)
+    return version
+
+
+def version_time(version):
+    return datetime.fromtimestamp(int(version) / 1e9, tz=timezone.utc)
+
+
+def get_version_time(namespace):
+    """When the namespace last changed, as far as this cache knows."""
+    return version_time(get_version(namespace))
+
+
+def bump_version(namespace):
+    # A nanosecond timestamp instead of cache.incr(): it cannot lose updates
+    # on backends without atomic increments.
+    version = str(time.time_ns())
+    cache.set(_version_key(namespace), version, None)
+    return version
+
+
+def invalidate(namespace):
+    # Bump straight away so the writing transaction never reads its old
+    # entries, and again after commit so nothing another request cached
+    # from pre-commit data survives.
+    bump_version(namespace)
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def get_or_build(namespace, name, build):
+    """Return the cached value for ``name`` at the current version, building it on a miss."""
+    key = f'rating_professors:{namespace}:{get_version(namespace)}:{name}'
+    value = cache.get(key)
+    if value is not None:
+        _stats[f'{namespace}_hits'] += 1
+        return value, True
+
+    _stats[f'{namespace}_misses'] += 1
+    value = build()
+    cache.set(key, value)
+    return value, False
+
+
+async def aget_or_build(namespace, name, build):
+    """get_or_build for async views; ``build`` is a coroutine function."""
+    key = f'rating_professors:{namespace}:{await aget_version(namespace)}:{name}'
+    value = await cache.aget(key)
+    if value is not None:
+        _stats[f'{namespace}_hits'] += 1
+        return value, True
+
+    _stats[f'{namespace}_misses'] += 1
+    value = await build()
+    await cache.aset(key, value)
+    return value, False
+
+
+def cache_stats():
+    return dict(_stats)
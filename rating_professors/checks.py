@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries are private to one process.
+PER_PROCESS_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register('caches')
+def check_shared_caches(app_configs, **kwargs):
+    """Warn when a cache that must be seen by every process is per process."""
+    errors = []
+    if settings.CACHES.get('default', {}).get('BACKEND') in PER_PROCESS_BACKENDS:
+        errors.append(Warning(
+            "The default cache is per process, so invalidations from other workers and from "
+            "management commands do not reach this one and it can serve stale responses.",
+            hint="Use a shared backend such as FileBasedCache, unless only one process serves the site.",
+            id='rating_professors.W001',
+        ))
+    if settings.CACHES.get('tokens', {}).get('BACKEND') in PER_PROCESS_BACKENDS:
+        errors.append(Warning(
+            "The tokens cache is per process, so revoked tokens could not be evicted from other "
+            "workers; CachedTokenAuthentication looks every token up in the database instead.",
+            hint="Use a shared backend such as FileBasedCache to cache token lookups.",
+            id='rating_professors.W002',
+        ))
+    return errors
@@ -0,0 +1,122 @@
+"""Negotiated gzip/brotli compression of responses above a size threshold.
+
+Brotli is used when the ``brotli`` package is installed and the client
+prefers or equally accepts it; otherwise gzip. Streaming responses are
+always compressed as they are sent, since their size is not known up front.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this many bytes are sent as they are.
+COMPRESSION_MIN_SIZE = 1024
+BROTLI_QUALITY = 5
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; ``*`` stands for any coding not listed."""
+    codings = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding.lower()] = q
+    return codings
+
+
+def choose_encoding(header):
+    codings = accepted_encodings(header)
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, codings.get('*', 0.0))
+        # Ties go to the first available coding, brotli.
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware with content negotiation, brotli and a configurable threshold.
+
+    The threshold is the ``COMPRESSION_MIN_SIZE`` setting.
+    """
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', COMPRESSION_MIN_SIZE)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, encoding)
+            # The compressed size is only known once the stream is sent.
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag names exact bytes; weaken it as GZipMiddleware does,
+        # so If-None-Match still matches whichever encoding the client got.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, response, encoding):
+        content = response.streaming_content
+        if not response.is_async:
+            if encoding == 'br':
+                return brotli_sequence(content)
+            return compress_sequence(content, max_random_bytes=self.max_random_bytes)
+
+        async def compressed():
+            if encoding == 'br':
+                compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+                async for chunk in content:
+                    data = compressor.process(chunk)
+                    if data:
+                        yield data
+                yield compressor.finish()
+            else:
+                # One gzip member per chunk, as GZipMiddleware does.
+                async for chunk in content:
+                    yield compress_string(chunk, max_random_bytes=self.max_random_bytes)
+
+        return compressed()
@@ -0,0 +1,39 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _validators(validator, last_modified):
+    etag = quote_etag(hashlib.md5(validator.encode()).hexdigest())
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _set_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_response(request, validator, last_modified, build):
+    """Answer 304 when the client's copy matches, otherwise build the response.
+
+    ``validator`` is any string that changes whenever the representation
+    does; ``build`` is only called when the client needs a fresh body.
+    """
+    etag, last_modified = _validators(validator, last_modified)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+    return _set_validators(build(), etag, last_modified)
+
+
+async def aconditional_response(request, validator, last_modified, build):
+    """conditional_response for async views; ``build`` is a coroutine function."""
+    etag, last_modified = _validators(validator, last_modified)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+    return _set_validators(await build(), etag, last_modified)
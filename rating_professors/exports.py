@@ -0,0 +1,87 @@
+"""Flat, constant-memory exports of the Rating table for analytics.
+
+Rows come straight from one joined SELECT via values_list().iterator(),
+so nothing is held beyond the current chunk and no model instances or
+serializers are involved.
+"""
+import csv
+import io
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Rating
+from .renderers import dumps
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, lookup) pairs; the lookups are joined in SQL.
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('user', 'user__username'),
+    ('professor_id', 'professor_id'),
+    ('professor', 'professor__name'),
+    ('module_code', 'module_instance__module__code'),
+    ('year', 'module_instance__year'),
+    ('semester', 'module_instance__semester'),
+    ('rating', 'rating'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+)
+
+
+def parse_since(value):
+    """An ISO date or datetime; naive values are in the current time zone."""
+    try:
+        since = parse_datetime(value) or parse_datetime(f'{value}T00:00:00')
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValueError(f"Not an ISO date or datetime: {value!r}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_queryset(since=None):
+    """Ratings as tuples in EXPORT_COLUMNS order, optionally only those updated at or after ``since``."""
+    ratings = Rating.objects.order_by('id')
+    if since is not None:
+        ratings = ratings.filter(updated_at__gte=since)
+    return ratings.values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _jsonl_lines(rows):
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield dumps(dict(zip(columns, row))) + '\n'
+
+
+def export_ratings(ratings, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export of ``ratings`` (from export_queryset) as text, ``chunk_size`` rows at a time."""
+    rows = ratings.iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        lines = _csv_lines(rows)
+        yield next(_csv_lines([[column for column, _ in EXPORT_COLUMNS]]))
+    else:
+        lines = _jsonl_lines(rows)
+
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rating_professors.exports import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_queryset, export_ratings, parse_since,
+)
+
+
+class Command(BaseCommand):
+    help = "Stream every rating, joined with its professor and module instance, as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--since', help="Only ratings updated at or after this ISO date/datetime")
+        parser.add_argument('--output', '-o', help="File to write to instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        chunks = export_ratings(export_queryset(since), options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
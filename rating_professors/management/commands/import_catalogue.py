@@ -0,0 +1,245 @@
+import csv
+import json
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rating_professors.assignments import assignment_index
+from rating_professors.cache import CATALOGUE, RATINGS, invalidate
+from rating_professors.models import Module, ModuleInstance, Professor
+
+KINDS = ('professors', 'modules', 'instances', 'assignments')
+
+
+def read_records(path, fmt):
+    """Yield (line number, record) from a CSV or JSONL file, one line at a time."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, exc
+
+
+def field(record, name):
+    """``record[name]`` as stripped text; a missing, null or nested value is an error.
+
+    Short CSV rows give None for their last columns, and JSONL values may
+    be numbers, null or objects.
+    """
+    value = record[name]
+    if value is None:
+        raise ValidationError(f"missing {name!r}")
+    if isinstance(value, (dict, list)):
+        raise ValidationError(f"{name!r} must be a single value")
+    return str(value).strip()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream professors, modules, module instances or assignments from a CSV or JSONL file into the "
+        "database, creating new rows and updating changed ones. Columns: professors name,email,department; "
+        "modules code,title[,credits]; instances module,year,semester; "
+        "assignments module,year,semester,professor (an email)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Cannot tell the format from the file name; pass --format csv or --format jsonl")
+        if not path.exists():
+            raise CommandError(f"No such file: {path}")
+
+        kind = options['kind']
+        parse = getattr(self, f'parse_{kind}')
+        save = getattr(self, f'save_{kind}')
+        self.counts = Counter()
+        self.module_ids = self.professor_ids = self.instance_ids = None
+
+        started = time.monotonic()
+        processed = 0
+        for chunk in chunked(read_records(path, fmt), options['chunk_size']):
+            rows = {}
+            for line_number, record in chunk:
+                try:
+                    if isinstance(record, Exception):
+                        raise ValidationError(str(record))
+                    key, row = parse(record)
+                except (KeyError, TypeError, ValueError, ValidationError) as exc:
+                    self.counts['errors'] += 1
+                    self.stderr.write(f"line {line_number}: {self.describe(exc)}")
+                    continue
+                # Within a chunk the last occurrence of a key wins.
+                rows[key] = row
+            with transaction.atomic():
+                save(rows)
+            processed += len(chunk)
+            elapsed = max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"{kind}: {processed} rows ({processed / elapsed:,.0f} rows/s)")
+
+        if self.counts['created'] or self.counts['updated']:
+            invalidate(CATALOGUE)
+            if kind == 'professors':
+                invalidate(RATINGS)
+            if kind == 'assignments':
+                assignment_index.invalidate()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {processed} {kind} rows in {elapsed:.1f}s ({processed / elapsed:,.0f} rows/s): "
+            f"{self.counts['created']} created, {self.counts['updated']} updated, "
+            f"{self.counts['unchanged']} unchanged, {self.counts['errors']} errors"
+        ))
+
+    @staticmethod
+    def describe(exc):
+        if isinstance(exc, KeyError):
+            return f"missing {exc.args[0]!r}"
+        if isinstance(exc, ValidationError):
+            return '; '.join(exc.messages)
+        return str(exc)
+
+    # Parsing: each returns (natural key, row) or raises for a bad record.
+
+    def parse_professors(self, record):
+        professor = Professor(
+            name=field(record, 'name'), email=field(record, 'email'), department=field(record, 'department')
+        )
+        professor.clean_fields(exclude=['rating_sum', 'rating_count'])
+        return professor.email, {'name': professor.name, 'department': professor.department}
+
+    def parse_modules(self, record):
+        module = Module(code=field(record, 'code'), title=field(record, 'title'))
+        row = {'title': module.title}
+        # Without a credits column, existing modules keep theirs.
+        if record.get('credits') not in (None, ''):
+            module.credits = row['credits'] = int(field(record, 'credits'))
+        module.clean_fields()
+        return module.code, row
+
+    def parse_instances(self, record):
+        module_id = self.lookup_module(field(record, 'module'))
+        instance = ModuleInstance(
+            module_id=module_id, year=int(field(record, 'year')), semester=int(field(record, 'semester'))
+        )
+        instance.clean_fields(exclude=['module'])
+        return (module_id, instance.year, instance.semester), {}
+
+    def parse_assignments(self, record):
+        module_id = self.lookup_module(field(record, 'module'))
+        instance_id = self.lookup_instance(module_id, int(field(record, 'year')), int(field(record, 'semester')))
+        professor_id = self.lookup_professor(field(record, 'professor'))
+        return (instance_id, professor_id), {}
+
+    # Foreign keys resolve through maps loaded once per import, not per row.
+
+    def lookup_module(self, code):
+        if self.module_ids is None:
+            self.module_ids = dict(Module.objects.values_list('code', 'id'))
+        try:
+            return self.module_ids[code]
+        except KeyError:
+            raise ValidationError(f"unknown module {code!r}")
+
+    def lookup_professor(self, email):
+        if self.professor_ids is None:
+            self.professor_ids = dict(Professor.objects.values_list('email', 'id'))
+        try:
+            return self.professor_ids[email]
+        except KeyError:
+            raise ValidationError(f"unknown professor {email!r}")
+
+    def lookup_instance(self, module_id, year, semester):
+        if self.instance_ids is None:
+            self.instance_ids = {
+                (module_id, year, semester): pk
+                for pk, module_id, year, semester in ModuleInstance.objects.values_list('id', 'module_id', 'year', 'semester')
+            }
+        try:
+            return self.instance_ids[module_id, year, semester]
+        except KeyError:
+            raise ValidationError(f"no instance of that module in {year} semester {semester}")
+
+    # Saving: one query for the chunk's existing rows, then bulk writes of
+    # only what is new or different.
+
+    def upsert(self, model, key_field, rows):
+        existing = model.objects.in_bulk(list(rows), field_name=key_field)
+        created, updated, update_fields = [], [], set()
+        for key, row in rows.items():
+            obj = existing.get(key)
+            if obj is None:
+                created.append(model(**{key_field: key}, **row))
+                continue
+            changed = {field: value for field, value in row.items() if getattr(obj, field) != value}
+            if changed:
+                for field, value in changed.items():
+                    setattr(obj, field, value)
+                update_fields.update(changed)
+                updated.append(obj)
+        model.objects.bulk_create(created)
+        if updated:
+            model.objects.bulk_update(updated, sorted(update_fields))
+        self.counts['created'] += len(created)
+        self.counts['updated'] += len(updated)
+        self.counts['unchanged'] += len(rows) - len(created) - len(updated)
+
+    def save_professors(self, rows):
+        self.upsert(Professor, 'email', rows)
+
+    def save_modules(self, rows):
+        self.upsert(Module, 'code', rows)
+
+    def save_instances(self, rows):
+        if not rows:
+            return
+        existing = set(
+            ModuleInstance.objects.filter(module_id__in={module_id for module_id, _, _ in rows})
+            .values_list('module_id', 'year', 'semester')
+        )
+        new = [key for key in rows if key not in existing]
+        ModuleInstance.objects.bulk_create(
+            ModuleInstance(module_id=module_id, year=year, semester=semester) for module_id, year, semester in new
+        )
+        self.counts['created'] += len(new)
+        self.counts['unchanged'] += len(rows) - len(new)
+
+    def save_assignments(self, rows):
+        if not rows:
+            return
+        through = ModuleInstance.professors.through
+        existing = set(
+            through.objects.filter(moduleinstance_id__in={instance_id for instance_id, _ in rows})
+            .values_list('moduleinstance_id', 'professor_id')
+        )
+        new = [key for key in rows if key not in existing]
+        through.objects.bulk_create(
+            through(moduleinstance_id=instance_id, professor_id=professor_id) for instance_id, professor_id in new
+        )
+        self.counts['created'] += len(new)
+        self.counts['unchanged'] += len(rows) - len(new)
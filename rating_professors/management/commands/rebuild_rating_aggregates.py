@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rating_professors.aggregates import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored professor rating totals and module rollups from the Rating table"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            professors = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {professors} professors"))
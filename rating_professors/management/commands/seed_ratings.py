@@ -0,0 +1,181 @@
+import math
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from rating_professors.aggregates import rebuild_rating_aggregates
+from rating_professors.cache import CATALOGUE, invalidate
+from rating_professors.models import Module, ModuleInstance, Professor, Rating
+
+EMAIL_DOMAIN = 'seed.example.com'
+USERNAME_PREFIX = 'seed-student-'
+CODE_PREFIX = 'SD'
+YEARS = range(2000, 2026)
+SEMESTERS = (1, 2)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic catalogue, students and ratings, "
+        "e.g. --professors 5000 --modules 2000 --instances 20000 --ratings 5000000. "
+        "The same --seed always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--professors', type=int, default=500)
+        parser.add_argument('--modules', type=int, default=200)
+        parser.add_argument('--instances', type=int, default=2000)
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--ratings', type=int, default=100000)
+        parser.add_argument('--professors-per-instance', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT transaction")
+        parser.add_argument('--flush', action='store_true', help="Delete previously seeded rows first")
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        professors, modules, instances = options['professors'], options['modules'], options['instances']
+        students, ratings = options['students'], options['ratings']
+        per_instance = min(options['professors_per_instance'], professors)
+
+        if min(professors, modules, instances, students, per_instance) < 1:
+            raise CommandError("All sizes must be at least 1")
+        if instances > modules * len(YEARS) * len(SEMESTERS):
+            raise CommandError(f"At most {len(YEARS) * len(SEMESTERS)} instances per module fit the year range")
+        # Every rating is a distinct (student, instance, professor) triple.
+        if ratings > instances * per_instance * students:
+            raise CommandError("More ratings requested than distinct (student, instance, professor) triples")
+        if len(f'{CODE_PREFIX}{modules - 1}') > Module._meta.get_field('code').max_length:
+            raise CommandError("Too many modules for the module code length")
+
+        if options['flush']:
+            self.flush()
+        elif Professor.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists():
+            raise CommandError("Seeded data already exists; pass --flush to replace it")
+
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+        total = 0
+
+        professor_ids = self.insert(Professor, 'professors', (
+            Professor(name=f'Professor {i}', email=f'professor{i}@{EMAIL_DOMAIN}', department=f'Department {i % 25}')
+            for i in range(professors)
+        ))
+        module_ids = self.insert(Module, 'modules', (
+            Module(code=f'{CODE_PREFIX}{i}', title=f'Module {i}', credits=rng.choice((10, 15, 20, 30)))
+            for i in range(modules)
+        ))
+        # Instance i is slot i // modules of module i % modules, so (module, year, semester) never repeats.
+        instance_ids = self.insert(ModuleInstance, 'module instances', (
+            ModuleInstance(
+                module_id=module_ids[i % modules],
+                year=YEARS[i // modules // len(SEMESTERS)],
+                semester=SEMESTERS[i // modules % len(SEMESTERS)],
+            )
+            for i in range(instances)
+        ))
+        student_ids = self.insert(User, 'students', (
+            User(username=f'{USERNAME_PREFIX}{i}', password='!') for i in range(students)
+        ))
+        total += professors + modules + instances + students
+
+        assigned = [rng.sample(professor_ids, per_instance) for _ in instance_ids]
+        total += self.insert_rows(ModuleInstance.professors.through, 'assignments', (
+            ModuleInstance.professors.through(moduleinstance_id=instance_id, professor_id=professor_id)
+            for instance_id, instance_professors in zip(instance_ids, assigned)
+            for professor_id in instance_professors
+        ))
+
+        # Spread the ratings evenly over instances; each instance's students
+        # are a contiguous (wrapping) block of users who rate all of its
+        # professors, which keeps (user, instance, professor) unique.
+        per_rating_instance, extra = divmod(ratings, instances)
+        enrolled = []
+        for index in range(instances):
+            count = per_rating_instance + (index < extra)
+            enrolled.append((rng.randrange(students), max(1, math.ceil(count / per_instance)), count))
+
+        total += self.insert_rows(ModuleInstance.students.through, 'enrolments', (
+            ModuleInstance.students.through(moduleinstance_id=instance_id, user_id=student_ids[(start + k) % students])
+            for instance_id, (start, size, _) in zip(instance_ids, enrolled)
+            for k in range(size)
+        ))
+
+        quality = {professor_id: rng.randint(1, 5) for professor_id in professor_ids}
+
+        def generate_ratings():
+            for instance_id, instance_professors, (start, size, count) in zip(instance_ids, assigned, enrolled):
+                for k in range(count):
+                    professor_id = instance_professors[k % per_instance]
+                    yield Rating(
+                        user_id=student_ids[(start + k // per_instance) % students],
+                        module_instance_id=instance_id,
+                        professor_id=professor_id,
+                        rating=min(5, max(1, quality[professor_id] + rng.choice((-1, 0, 0, 1)))),
+                    )
+
+        total += self.insert_rows(Rating, 'ratings', generate_ratings())
+
+        with transaction.atomic():
+            rebuild_rating_aggregates(professor_ids)
+        invalidate(CATALOGUE)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"
+        ))
+
+    def insert(self, model, label, objects):
+        """bulk_create ``objects`` in batched transactions and return the new primary keys."""
+        ids = []
+        started = time.monotonic()
+        for chunk in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                ids.extend(obj.pk for obj in model.objects.bulk_create(chunk))
+        self.report(label, len(ids), started)
+        return ids
+
+    def insert_rows(self, model, label, objects):
+        """Like insert() for rows whose keys are not needed afterwards."""
+        count = 0
+        started = time.monotonic()
+        for chunk in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            count += len(chunk)
+        self.report(label, count, started)
+        return count
+
+    def report(self, label, count, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f"{label}: {count} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+
+    def flush(self):
+        seeded_professors = Professor.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+        with transaction.atomic():
+            # Seeded ratings go in one raw DELETE. Through the ORM, the Rating
+            # receivers would have every row loaded and signalled one by one;
+            # the totals are rebuilt once below instead.
+            professor_sql, params = seeded_professors.values('pk').query.sql_with_params()
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {quote(Rating._meta.db_table)} "
+                    f"WHERE {quote(Rating._meta.get_field('professor').column)} IN ({professor_sql})",
+                    params,
+                )
+            seeded_professors.delete()
+            Module.objects.filter(code__regex=rf'^{CODE_PREFIX}\d+$', title__regex=r'^Module \d+$').delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            rebuild_rating_aggregates()
+        invalidate(CATALOGUE)
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Professor = apps.get_model('rating_professors', 'Professor')
+    Rating = apps.get_model('rating_professors', 'Rating')
+
+    ratings = Rating.objects.filter(professor=OuterRef('pk')).order_by().values('professor')
+    Professor.objects.update(
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('pk')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rating_professors', '0009_alter_rating_professor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
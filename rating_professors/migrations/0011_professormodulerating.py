@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def populate_module_ratings(apps, schema_editor):
+    ProfessorModuleRating = apps.get_model('rating_professors', 'ProfessorModuleRating')
+    Rating = apps.get_model('rating_professors', 'Rating')
+
+    totals = (
+        Rating.objects.order_by()
+        .values('professor_id', module_id=F('module_instance__module_id'))
+        .annotate(rating_sum=Sum('rating'), rating_count=Count('pk'))
+    )
+    ProfessorModuleRating.objects.bulk_create(
+        [ProfessorModuleRating(**row) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rating_professors', '0010_professor_rating_sum_professor_rating_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessorModuleRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='professor_ratings', to='rating_professors.module')),
+                ('professor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='module_ratings', to='rating_professors.professor')),
+            ],
+            options={
+                'unique_together': {('professor', 'module')},
+            },
+        ),
+        migrations.RunPython(populate_module_ratings, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,39 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
 
 
 class Professor(models.Model):
     name = models.CharField(max_length = 100)
     email = models.EmailField(unique=True)
     department = models.CharField(max_length = 100)
+    # Running totals maintained by the Rating signals, see aggregates.py
+    rating_sum = models.PositiveIntegerField(default = 0, editable = False)
+    rating_count = models.PositiveIntegerField(default = 0, editable = False)
+
+    AGGREGATE_FIELDS = ('rating_sum', 'rating_count')
+
+    def save(self, *args, **kwargs):
+        # The totals only change in SQL, from the Rating signals. Writing
+        # them back from a possibly stale instance would undo ratings made
+        # since it was loaded, so updates leave them out.
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def get_average_rating(self):
-        ratings = self.ratings.all()  
-        if ratings.exists():
-            avg = ratings.aggregate(Avg('rating'))['rating__avg']
-            return round(avg) 
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count)
         return 0
     
     def get_average_rating_for_module(self, module_code):
-        ratings = self.ratings.filter(module_instance__module__code = module_code)
-        if ratings.exists():
-            avg = ratings.aggregate(Avg('rating'))['rating__avg']
-            return round(avg)  
+        module_rating = self.module_ratings.filter(module__code = module_code).first()
+        if module_rating:
+            return round(module_rating.average_rating)
         return 0
 
     def __str__(self):
@@ -37,6 +50,14 @@ class Module(models.Model):
         return f"{self.code}: {self.title}"
     
 
+class ModuleInstanceQuerySet(models.QuerySet):
+    def for_listing(self):
+        # Everything ModuleInstanceSerializer touches, in a fixed number of queries.
+        return self.select_related('module').prefetch_related(
+            models.Prefetch('professors', queryset=Professor.objects.only('id', 'name', 'department'))
+        )
+
+
 class ModuleInstance(models.Model):
     SEMESTER_CHOICES = [
         (1, "Semester One"),
@@ -52,6 +73,8 @@ class ModuleInstance(models.Model):
     professors = models.ManyToManyField(Professor, related_name='module_instances')
     students = models.ManyToManyField(User, related_name='module_instances') 
 
+    objects = ModuleInstanceQuerySet.as_manager()
+
     class Meta:
         unique_together = ('module', 'year', 'semester')
 
@@ -73,6 +96,62 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ('user', 'module_instance', 'professor')
+        indexes = [
+            # Ratings of a professor within a module, joined through the instance.
+            models.Index(fields=['professor', 'module_instance'], name='rating_professor_instance_idx'),
+            # RatingViewSet: a user's ratings, newest first.
+            models.Index(fields=['user', 'created_at'], name='rating_user_created_idx'),
+            # Admin changelist ordering and date filter.
+            models.Index(fields=['created_at'], name='rating_created_idx'),
+            # Max('updated_at') behind the professor-ratings validators.
+            models.Index(fields=['updated_at'], name='rating_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.take_snapshot()
+        return instance
+
+    def take_snapshot(self):
+        # Remember what is stored so the signals can apply the difference
+        # to the aggregates without reading the row back.
+        self._snapshot = (
+            self.__dict__.get('professor_id'),
+            self.__dict__.get('module_instance_id'),
+            self.__dict__.get('rating'),
+        )
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Rating, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Rating, instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} rated {self.professor.name} {self.rating}/5"
+
+
+class ProfessorModuleRating(models.Model):
+    """Running rating totals per (professor, module), maintained by the Rating signals."""
+    professor = models.ForeignKey(Professor, on_delete=models.CASCADE, related_name='module_ratings')
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='professor_ratings')
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('professor', 'module')
+
+    @property
+    def average_rating(self):
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
+        return 0
+
+    def __str__(self):
+        return f"{self.professor.name} in {self.module.code}: {self.rating_sum}/{self.rating_count}"
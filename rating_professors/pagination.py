@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """Keyset pagination that only applies when the client asks for it.
+
+    Sending ``cursor`` or ``page_size`` switches a list to pages of
+    ``{"next", "previous", "results"}``; without either the full list is
+    returned as before.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RatingCursorPagination(OptionalCursorPagination):
+    ordering = ('-created_at', '-id')
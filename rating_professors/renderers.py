@@ -0,0 +1,69 @@
+"""JSON rendering and parsing through orjson when it is installed.
+
+orjson encodes the large list responses several times faster than the
+standard library. Without it, or for anything orjson cannot represent
+(indented output, integers beyond 64 bits), the classes behave exactly
+like DRF's own, so the output is the same either way.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# UTC datetimes end in "Z" and dict keys may be ints, as with DRF's encoder.
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_fallback_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _default(obj):
+    # Decimals, lazy strings, querysets, ... as DRF encodes them.
+    return _fallback_encoder.default(obj)
+
+
+def dumps(obj):
+    """Compact JSON text for ``obj``, encoded as DRF would."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode()
+        except TypeError:
+            pass
+    return _fallback_encoder.encode(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None or orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type or '', renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, as they end a line in JavaScript.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        # orjson reads only UTF-8, and always rejects the NaN and Infinity
+        # that non-strict mode allows.
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
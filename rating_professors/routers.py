@@ -0,0 +1,87 @@
+"""Read/write splitting between the primary database and a read replica.
+
+Only requests that opt in through ReplicaReadMixin read from the replica,
+and only for this app's models; auth and token lookups always hit the
+primary. After a user writes, their reads stay on the primary for
+READ_YOUR_WRITES_SECONDS so they see their own changes despite
+replication lag. The pin is kept in the default cache, which must be
+shared between workers for it to follow the user (see checks.py).
+
+Querysets evaluated after dispatch returns, such as those behind a
+streaming response, no longer see the routing decision; pin them to
+their database with ``.using(queryset.db)`` before returning. Views that
+answer conditional GETs skip their validators when reads_replica() is
+true, as a lagging replica's body must not go out under validators
+derived from the primary.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router
+from rest_framework.permissions import SAFE_METHODS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _pin_key(user):
+    return f'rating_professors:pin-primary:{user.pk}'
+
+
+def pin_to_primary(user):
+    cache.set(_pin_key(user), True, getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5))
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(_pin_key(user), False)
+
+
+def reads_replica(model):
+    """Whether reads of ``model`` in the current request go to the replica."""
+    return router.db_for_read(model) != DEFAULT_DB_ALIAS
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'READ_REPLICA_ALIAS', None)
+        if replica and _replica_reads.get() and model._meta.app_label == 'rating_professors':
+            return replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+
+class ReplicaReadMixin:
+    """Let safe requests to a view read from the replica unless the user is pinned."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica_reads.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Decided after authentication, since pinning is per user.
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            _replica_reads.set(True)
+
+
+class ReadYourWritesMiddleware:
+    """Pin a user's reads to the primary after any successful unsafe request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and user and user.is_authenticated:
+            pin_to_primary(user)
+        return response
@@ -135,6 +135,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from rest_framework.validators import UniqueValidator  
 from django.contrib.auth.models import User
 from .models import Professor, Module, ModuleInstance, Rating
+from .assignments import assignment_index
+from .services import upsert_rating
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -203,6 +205,10 @@ class RatingSerializer(serializers.ModelSerializer):
 
 
 class CreateRatingSerializer(serializers.ModelSerializer):
+    # Plain ids checked against the assignment index, so a submit loads
+    # neither the professor nor the module instance.
+    professor = serializers.IntegerField()
+    module_instance = serializers.IntegerField()
     rating = serializers.IntegerField(validators = [MinValueValidator(1), MaxValueValidator(5)])
 
     class Meta:
@@ -210,37 +216,59 @@ class CreateRatingSerializer(serializers.ModelSerializer):
         fields = ('professor', 'module_instance', 'rating')
 
     def validate(self, data):
-        professor = data['professor']
-        module_instance = data['module_instance']
+        module_instance_id = data['module_instance']
+        entry = assignment_index.lookup([module_instance_id]).get(module_instance_id)
+        if entry is None:
+            raise serializers.ValidationError(
+                {'module_instance': [f'Invalid pk "{module_instance_id}" - object does not exist.']}
+            )
 
-        if not module_instance.professors.filter(id = professor.id).exists():
+        module_id, professor_ids = entry
+        if data['professor'] not in professor_ids:
             raise serializers.ValidationError("This professor is not assigned to the selected module instance.")
-        
-        user = self.context['request'].user
-        existing_rating = Rating.objects.filter(
-            user=user,
-            professor=professor,
-            module_instance=module_instance
-        ).first()
-
-        if existing_rating:
-            data['existing_rating'] = existing_rating
 
+        data['module_id'] = module_id
         return data
     
     def create(self, validated_data):
-        existing_rating = validated_data.get('existing_rating', None)
+        # Upsert rather than look up an existing rating first; self.created
+        # tells the caller which of the two happened.
+        rating, self.created = upsert_rating(
+            validated_data.get('user') or self.context['request'].user,
+            validated_data['professor'],
+            validated_data['module_instance'],
+            validated_data['module_id'],
+            validated_data['rating'],
+        )
+        return rating
+
+
+class CreateRatingByCodeSerializer(CreateRatingSerializer):
+    # Names the module instance by its natural key, so clients need no id lookup first.
+    module_code = serializers.CharField(write_only = True)
+    year = serializers.IntegerField(write_only = True)
+    semester = serializers.IntegerField(write_only = True)
 
-        if existing_rating:
-            existing_rating.rating = validated_data['rating']
-            existing_rating.save()
-            return existing_rating
-        
-        validated_data['user'] = self.context['request'].user  
-        return Rating.objects.create(**validated_data)
+    class Meta(CreateRatingSerializer.Meta):
+        fields = ('professor', 'module_code', 'year', 'semester', 'rating')
+
+    def validate(self, data):
+        module_instance_id = ModuleInstance.objects.filter(
+            module__code = data.pop('module_code'), year = data.pop('year'), semester = data.pop('semester')
+        ).values_list('id', flat = True).first()
+        if module_instance_id is None:
+            raise serializers.ValidationError("Module instance not found.")
+        data['module_instance'] = module_instance_id
+        return super().validate(data)
 
 
 class ProfessorModuleRatingSerializer(serializers.Serializer):
     average_rating = serializers.IntegerField()
     module_code = serializers.CharField()
-    module_title = serializers.CharField()
\ No newline at end of file
+    module_title = serializers.CharField()
+
+class BatchRatingItemSerializer(serializers.Serializer):
+    # Plain ids: the batch resolves professors and module instances in bulk.
+    professor = serializers.IntegerField()
+    module_instance = serializers.IntegerField()
+    rating = serializers.IntegerField(validators = [MinValueValidator(1), MaxValueValidator(5)])
@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Case, Exists, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .aggregates import apply_rating_delta
+from .assignments import assignment_index
+from .cache import RATINGS, invalidate
+from .models import Professor, Rating
+
+NOT_ASSIGNED = "This professor is not assigned to the selected module instance."
+SUPERSEDED = "Superseded by a later item for the same professor and module instance."
+
+
+def lock_professors(using, professor_ids):
+    """Lock the professors' rows until the end of the transaction, in primary key order.
+
+    Every change to a professor's rating totals goes through this lock, so
+    reading the ratings being replaced afterwards sees every earlier write.
+    Backends without SELECT ... FOR UPDATE, such as SQLite, are not queried;
+    there the write transaction (BEGIN IMMEDIATE, see transactions.py)
+    serialises writers instead.
+    """
+    if not connections[using].features.has_select_for_update:
+        return
+    professors = Professor.objects.using(using).select_for_update().filter(pk__in=professor_ids)
+    list(professors.order_by('pk').values_list('pk', flat=True))
+
+
+def upsert_rating(user, professor_id, module_instance_id, module_id, rating):
+    """Create or update ``user``'s rating with one INSERT ... ON CONFLICT statement.
+
+    ``module_id`` is the module of ``module_instance_id``; callers have it
+    from the assignment check.
+
+    Returns ``(rating, created)``. The aggregate deltas are worked out in SQL
+    against the row being replaced, so nothing is read back into Python and
+    concurrent submits of the same key cannot collide on the unique constraint.
+    The professor's row is locked first, so concurrent submits touching its
+    totals queue up and each sees the rating the one before it stored.
+    """
+    using = router.db_for_write(Rating)
+    connection = connections[using]
+    now = timezone.now()
+    opts = Rating._meta
+    quote = connection.ops.quote_name
+    user_col, professor_col, instance_col, rating_col, created_col, updated_col = (
+        quote(opts.get_field(name).column)
+        for name in ('user', 'professor', 'module_instance', 'rating', 'created_at', 'updated_at')
+    )
+    sql = (
+        f"INSERT INTO {quote(opts.db_table)} "
+        f"({user_col}, {professor_col}, {instance_col}, {rating_col}, {created_col}, {updated_col}) "
+        "VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({user_col}, {instance_col}, {professor_col}) "
+        f"DO UPDATE SET {rating_col} = excluded.{rating_col}, {updated_col} = excluded.{updated_col} "
+        # Only a fresh insert has both timestamps equal.
+        f"RETURNING {quote(opts.pk.column)}, {created_col} = {updated_col}"
+    )
+    stamp = connection.ops.adapt_datetimefield_value(now)
+
+    existing = Rating.objects.using(using).filter(
+        user=user, professor_id=professor_id, module_instance_id=module_instance_id
+    )
+    with transaction.atomic(using=using):
+        lock_professors(using, [professor_id])
+        # A statement after the lock: on PostgreSQL its snapshot includes
+        # whatever the transaction that held the lock committed.
+        apply_rating_delta(
+            professor_id, module_id,
+            Value(rating) - Coalesce(Subquery(existing.values('rating')[:1]), 0),
+            Case(When(Exists(existing), then=Value(0)), default=Value(1)),
+            initial=(rating, 1),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, professor_id, module_instance_id, rating, stamp, stamp])
+            pk, created = cursor.fetchone()
+        invalidate(RATINGS)
+
+    instance = Rating(
+        pk=pk, user=user, professor_id=professor_id, module_instance_id=module_instance_id, rating=rating, updated_at=now
+    )
+    instance._state.adding = False
+    instance._state.db = using
+    instance.take_snapshot()
+    return instance, bool(created)
+
+
+def submit_ratings(user, items):
+    """Create or update many of ``user``'s ratings in one transaction.
+
+    ``items`` are validated dicts with ``professor``, ``module_instance`` and
+    ``rating`` ids/values. Returns one ``{"status", ...}`` dict per item, in
+    order; status is ``created``, ``updated`` or ``error``.
+    """
+    results = [None] * len(items)
+
+    # Last item wins when the same pair is rated twice in one batch.
+    latest = {}
+    for index, item in enumerate(items):
+        key = (item['professor'], item['module_instance'])
+        if key in latest:
+            results[latest[key]] = {'status': 'error', 'errors': {'non_field_errors': [SUPERSEDED]}}
+        latest[key] = index
+
+    instances = assignment_index.lookup(module_instance_id for _, module_instance_id in latest)
+    module_ids, accepted = {}, {}
+    for (professor_id, module_instance_id), index in latest.items():
+        module_id, professor_ids = instances.get(module_instance_id, (None, ()))
+        if professor_id in professor_ids:
+            module_ids[module_instance_id] = module_id
+            accepted[(professor_id, module_instance_id)] = index
+        else:
+            results[index] = {'status': 'error', 'errors': {'non_field_errors': [NOT_ASSIGNED]}}
+
+    if accepted:
+        using = router.db_for_write(Rating)
+        with transaction.atomic(using=using):
+            lock_professors(using, {professor_id for professor_id, _ in accepted})
+            pairs = Q()
+            for professor_id, module_instance_id in accepted:
+                pairs |= Q(professor_id=professor_id, module_instance_id=module_instance_id)
+            existing = {
+                (professor_id, module_instance_id): rating
+                for professor_id, module_instance_id, rating in Rating.objects.using(using).filter(
+                    pairs, user=user
+                ).values_list('professor_id', 'module_instance_id', 'rating')
+            }
+
+            Rating.objects.using(using).bulk_create(
+                [
+                    Rating(user=user, professor_id=professor_id, module_instance_id=module_instance_id,
+                           rating=items[index]['rating'])
+                    for (professor_id, module_instance_id), index in accepted.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['user', 'module_instance', 'professor'],
+                update_fields=['rating', 'updated_at'],
+            )
+
+            # bulk_create bypasses the Rating signals, so apply the totals here.
+            deltas = defaultdict(lambda: [0, 0])
+            for (professor_id, module_instance_id), index in accepted.items():
+                rating = items[index]['rating']
+                delta = deltas[(professor_id, module_ids[module_instance_id])]
+                if (professor_id, module_instance_id) in existing:
+                    delta[0] += rating - existing[(professor_id, module_instance_id)]
+                    results[index] = {'status': 'updated'}
+                else:
+                    delta[0] += rating
+                    delta[1] += 1
+                    results[index] = {'status': 'created'}
+            for (professor_id, module_id), (sum_delta, count_delta) in deltas.items():
+                apply_rating_delta(professor_id, module_id, sum_delta, count_delta)
+            invalidate(RATINGS)
+
+    return results
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .aggregates import apply_rating_delta, rebuild_rating_aggregates
+from .assignments import assignment_index
+from .authentication import evict_token
+from .cache import CATALOGUE, RATINGS, invalidate
+from .models import Module, ModuleInstance, Professor, Rating
+
+
+def _module_id(rating, module_instance_id):
+    cached = Rating.module_instance.field.get_cached_value(rating, default=None)
+    if cached is not None and cached.pk == module_instance_id:
+        return cached.module_id
+    return ModuleInstance.objects.filter(pk=module_instance_id).values_list('module_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Rating)
+def rating_saving(sender, instance, raw=False, **kwargs):
+    # Without a snapshot there is nothing to diff against, so the post_save
+    # receiver rebuilds; it needs the professor the stored row belongs to.
+    if raw or instance._state.adding or getattr(instance, '_snapshot', (None, None, None))[2] is not None:
+        return
+    instance._stored_professor_id = Rating._base_manager.using(kwargs.get('using')).filter(
+        pk=instance.pk
+    ).values_list('professor_id', flat=True).first()
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    professor_id, module_instance_id = instance.professor_id, instance.module_instance_id
+    if created:
+        apply_rating_delta(professor_id, _module_id(instance, module_instance_id), instance.rating, 1)
+    else:
+        old_professor_id, old_module_instance_id, old_rating = getattr(instance, '_snapshot', (None, None, None))
+        if old_rating is None:
+            # Saved without being loaded first, so there is nothing to diff
+            # against. Rebuild both professors in case the rating moved.
+            stored_professor_id = instance.__dict__.pop('_stored_professor_id', None)
+            rebuild_rating_aggregates({professor_id, stored_professor_id} - {None})
+        elif (old_professor_id, old_module_instance_id) != (professor_id, module_instance_id):
+            apply_rating_delta(old_professor_id, _module_id(instance, old_module_instance_id), -old_rating, -1)
+            apply_rating_delta(professor_id, _module_id(instance, module_instance_id), instance.rating, 1)
+        elif instance.rating != old_rating:
+            apply_rating_delta(professor_id, _module_id(instance, module_instance_id), instance.rating - old_rating, 0)
+
+    instance.take_snapshot()
+    invalidate(RATINGS)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    professor_id, module_instance_id, rating = getattr(instance, '_snapshot', (None, None, None))
+    if rating is None:
+        professor_id, module_instance_id, rating = instance.professor_id, instance.module_instance_id, instance.rating
+    apply_rating_delta(professor_id, _module_id(instance, module_instance_id), -rating, -1)
+    invalidate(RATINGS)
+
+
+@receiver(post_save, sender=Professor)
+@receiver(post_delete, sender=Professor)
+def professor_changed(sender, **kwargs):
+    # Names and the set of professors are part of the cached leaderboard.
+    invalidate(RATINGS)
+    invalidate(CATALOGUE)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=ModuleInstance)
+@receiver(post_delete, sender=ModuleInstance)
+def catalogue_changed(sender, **kwargs):
+    invalidate(CATALOGUE)
+
+
+@receiver(m2m_changed, sender=ModuleInstance.professors.through)
+def module_instance_professors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            assignment_index.invalidate([instance.pk])
+        else:
+            # From the professor side pk_set holds module instance ids, and is
+            # None on clear.
+            assignment_index.invalidate(pk_set)
+        invalidate(CATALOGUE)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    evict_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    # Covers deactivation and any other change to the cached user object.
+    if not created and not raw:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            evict_token(key)
@@ -0,0 +1,28 @@
+from django.http import StreamingHttpResponse
+
+from .renderers import dumps
+
+# Rows fetched per database round trip and flushed per write.
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(request):
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_json_array(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """Encode an iterable of dicts as a JSON array, one chunk at a time."""
+    buffer = ['[']
+    for index, row in enumerate(rows):
+        if index:
+            buffer.append(',')
+        buffer.append(dumps(row))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    buffer.append(']')
+    yield ''.join(buffer)
+
+
+def streaming_json_response(rows):
+    return StreamingHttpResponse(stream_json_array(rows), content_type='application/json')
@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheTestRunner(DiscoverRunner):
+    """DiscoverRunner that points file-based caches at a temporary directory.
+
+    The shared cache directory of a running server, or of an earlier test
+    run, would otherwise hand the tests version tokens and entries built
+    from another database.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache_settings = override_settings(CACHES={
+            alias: {**config, 'LOCATION': os.path.join(self.cache_dir.name, alias)}
+            if config['BACKEND'].endswith('FileBasedCache') else config
+            for alias, config in settings.CACHES.items()
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
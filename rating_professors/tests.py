@@ -1,12 +1,48 @@
+import importlib.util
+import datetime
+import decimal
+import gzip
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
-from .models import Professor, Module, ModuleInstance, Rating
+from .models import Professor, Module, ModuleInstance, Rating, ProfessorModuleRating
+from .assignments import AssignmentIndex, assignment_index
+from .transactions import write_transaction
+from .aggregates import rebuild_rating_aggregates
+from .admin import EstimatedCountPaginator
+from .checks import check_shared_caches
+from .routers import pin_to_primary
+from .management.commands.seed_ratings import Command as SeedRatingsCommand
+from . import compression, renderers
+from django.conf import settings
 from django.test import TestCase, Client
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, router, transaction
+from django.core.servers.basehttp import WSGIServer
+from django.test import LiveServerTestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.testcases import LiveServerThread
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
-from django.db.models import Avg
+from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
+from django.db.models import Avg, Max
+from django.db.models.signals import post_delete
 from .models import Professor, Module, ModuleInstance, Rating
 
 class UserRegistrationTests(APITestCase):
@@ -93,6 +129,24 @@ class ModuleInstanceTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)  
 
+    def test_list_query_count_is_constant(self):
+        urls = [reverse('module-instance-list'), '/api/api/module-instances/']
+        with CaptureQueriesContext(connection) as small:
+            for url in urls:
+                self.client.get(url)
+
+        for year in range(2000, 2020):
+            module = Module.objects.create(code=f'M{year}', title=f'Module {year}')
+            instance = ModuleInstance.objects.create(module=module, year=year, semester=2)
+            professor = Professor.objects.create(name=f'Professor {year}', email=f'p{year}@example.com', department='CS')
+            instance.professors.add(professor, self.professor)
+
+        with CaptureQueriesContext(connection) as large:
+            for url in urls:
+                response = self.client.get(url)
+        self.assertEqual(len(response.data), 21)
+        self.assertEqual(len(large), len(small))
+
 
 class ProfessorRatingTests(APITestCase):
     def setUp(self):
@@ -154,4 +208,1399 @@ class RateProfessorTests(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Rating.objects.count(), 1)  
\ No newline at end of file
+        self.assertEqual(Rating.objects.count(), 1)  
+
+class RatingAggregateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+
+    def test_aggregates_follow_create_update_delete(self):
+        rating = Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=5)
+        Rating.objects.create(user=self.other_user, professor=self.professor, module_instance=self.module_instance, rating=2)
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (7, 2))
+
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.rating = 3
+        rating.save()
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (5, 2))
+
+        rating.delete()
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (2, 1))
+
+        self.other_user.delete()
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (0, 0))
+
+    def test_moving_a_rating_without_snapshot_rebuilds_both_professors(self):
+        other = Professor.objects.create(name='Professor Other', email='po@example.com', department='CS')
+        self.module_instance.professors.add(other)
+        rating = Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=5)
+        moved = Rating(pk=rating.pk, user=self.user, professor=other, module_instance=self.module_instance,
+                       rating=3, created_at=rating.created_at)
+        moved._state.adding = False
+        moved.save()
+        self.professor.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (0, 0))
+        self.assertEqual((other.rating_sum, other.rating_count), (3, 1))
+        self.assertEqual(self.professor.get_average_rating_for_module('CD1'), 0)
+
+    def test_stale_professor_save_keeps_totals(self):
+        stale = Professor.objects.get(pk=self.professor.pk)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=5)
+        stale.department = 'Maths'
+        stale.save()
+        self.professor.refresh_from_db()
+        self.assertEqual(self.professor.department, 'Maths')
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (5, 1))
+
+    def test_rating_through_api_updates_aggregates(self):
+        url = reverse('rate-professor')
+        data = {'professor': self.professor.id, 'module_instance': self.module_instance.id, 'rating': 4}
+        self.client.post(url, data, format='json')
+        data['rating'] = 2
+        self.client.post(url, data, format='json')
+
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (2, 1))
+        self.assertEqual(self.professor.get_average_rating(), 2)
+
+    def test_professor_list_query_count(self):
+        for i in range(5):
+            Professor.objects.create(name=f'Professor {i}', email=f'p{i}@example.com', department='CS')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/api/professors/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rebuild_rating_aggregates_command(self):
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=4)
+        Professor.objects.update(rating_sum=0, rating_count=0)
+        ProfessorModuleRating.objects.all().delete()
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (4, 1))
+        self.assertEqual(self.professor.get_average_rating_for_module('CD1'), 4)
+
+
+class ProfessorModuleRatingRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.later_instance = ModuleInstance.objects.create(module=self.module, year=2024, semester=1)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=5)
+        Rating.objects.create(user=self.other_user, professor=self.professor, module_instance=self.later_instance, rating=2)
+
+    def test_rollup_tracks_ratings_across_instances(self):
+        module_rating = ProfessorModuleRating.objects.get(professor=self.professor, module=self.module)
+        self.assertEqual((module_rating.rating_sum, module_rating.rating_count), (7, 2))
+        self.assertEqual(self.professor.get_average_rating_for_module('CD1'), 4)
+
+        Rating.objects.filter(user=self.other_user).delete()
+        module_rating.refresh_from_db()
+        self.assertEqual((module_rating.rating_sum, module_rating.rating_count), (5, 1))
+
+    def test_view_uses_single_query(self):
+        url = reverse('professor-module-rating', args=[self.professor.id, self.module.code])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['average_rating'], 3.5)
+
+    def test_view_without_ratings(self):
+        other = Professor.objects.create(name='Professor Unrated', email='pu@example.com', department='CS')
+        response = self.client.get(reverse('professor-module-rating', args=[other.id, self.module.code]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['average_rating'], 0)
+
+        response = self.client.get(reverse('professor-module-rating', args=[other.id, 'NOPE']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        for year in range(2020, 2024):
+            module = Module.objects.create(code=f'CD{year}', title='Computing for Dummies')
+            instance = ModuleInstance.objects.create(module=module, year=year, semester=1)
+            instance.professors.add(self.professor)
+            Rating.objects.create(user=self.user, professor=self.professor, module_instance=instance, rating=year % 5 + 1)
+
+    def test_streamed_output_matches_regular_output(self):
+        for url in (reverse('module-instance-list'), reverse('professor-ratings')):
+            regular = self.client.get(url)
+            streamed = self.client.get(url, {'stream': 'true'})
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(b''.join(streamed.streaming_content)), json.loads(regular.content))
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        for i in range(5):
+            professor = Professor.objects.create(name=f'Professor {i}', email=f'p{i}@example.com', department='CS')
+            instance = ModuleInstance.objects.create(module=module, year=2020 + i, semester=1)
+            instance.professors.add(professor)
+            Rating.objects.create(user=self.user, professor=professor, module_instance=instance, rating=3)
+
+    def collect_pages(self, url):
+        rows, params = [], {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows.extend(response.data['results'])
+            url, params = response.data['next'], None
+        return rows
+
+    def test_following_cursors_returns_every_row_once(self):
+        for url in (reverse('professor-ratings'), reverse('module-instance-list'),
+                    '/api/api/professors/', '/api/api/module-instances/', '/api/api/ratings/'):
+            rows = self.collect_pages(url)
+            self.assertEqual(len(rows), 5, url)
+            self.assertEqual(len({row['id'] for row in rows}), 5, url)
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(reverse('professor-ratings'))
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/api/professors/', {'page_size': 10 ** 6})
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class ProfessorRatingsCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+
+    def test_rating_write_invalidates_cached_response(self):
+        url = reverse('professor-ratings')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data[0]['average_rating'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rating = Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=4)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['average_rating'], 4)
+
+        rating.delete()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['average_rating'], 0)
+
+    def test_invalidation_from_another_process(self):
+        url = reverse('professor-ratings')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        # As a management command would, from a process of its own.
+        env = {**os.environ, 'CACHE_LOCATION': settings.CACHES['default']['LOCATION']}
+        subprocess.run([
+            sys.executable, '-c',
+            "import django; django.setup(); from rating_professors.cache import RATINGS, bump_version; bump_version(RATINGS)",
+        ], cwd=settings.BASE_DIR, env=env, check=True, timeout=60)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_per_process_cache_warning(self):
+        self.assertEqual(check_shared_caches(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_shared_caches(None)], ['rating_professors.W001'])
+
+    def test_cache_stats_require_staff(self):
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.get(reverse('professor-ratings'))
+        self.client.force_authenticate(user=User.objects.create_user(username='staff', password='x', is_staff=True))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ratings_misses', response.data)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=4)
+
+    def urls(self):
+        return [
+            reverse('professor-ratings'),
+            reverse('module-instance-list'),
+            reverse('professor-module-rating', args=[self.professor.id, self.module.code]),
+        ]
+
+    def test_matching_etag_returns_not_modified_without_main_query(self):
+        for url in self.urls():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_if_modified_since(self):
+        for url in self.urls():
+            response = self.client.get(url)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_writes_change_the_validator(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls()]
+
+        Rating.objects.create(user=self.other_user, professor=self.professor, module_instance=self.module_instance, rating=2)
+        self.module.title = 'Computing for Experts'
+        self.module.save()
+
+        for url, etag in zip(self.urls(), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+
+class BatchRatingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.other_professor = Professor.objects.create(name='Professor Unassigned', email='pu@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.instances = []
+        for year in (2021, 2022, 2023):
+            instance = ModuleInstance.objects.create(module=self.module, year=year, semester=1)
+            instance.professors.add(self.professor)
+            self.instances.append(instance)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.instances[0], rating=1)
+
+    def test_batch_upserts_and_reports_each_item(self):
+        data = [
+            {'professor': self.professor.id, 'module_instance': self.instances[0].id, 'rating': 5},
+            {'professor': self.professor.id, 'module_instance': self.instances[1].id, 'rating': 3},
+            {'professor': self.other_professor.id, 'module_instance': self.instances[2].id, 'rating': 4},
+            {'professor': self.professor.id, 'module_instance': self.instances[2].id, 'rating': 9},
+        ]
+        response = self.client.post(reverse('rate-professor-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in response.data], ['updated', 'created', 'error', 'error'])
+        self.assertIn('rating', response.data[3]['errors'])
+
+        self.assertEqual(Rating.objects.get(module_instance=self.instances[0]).rating, 5)
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (8, 2))
+        self.assertEqual(self.professor.get_average_rating_for_module('CD1'), 4)
+
+    def test_batch_query_count_does_not_grow(self):
+        data = [
+            {'professor': self.professor.id, 'module_instance': instance.id, 'rating': 2}
+            for instance in self.instances
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('rate-professor-batch'), data[:1], format='json')
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.post(reverse('rate-professor-batch'), data, format='json')
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_batch_requires_list(self):
+        response = self.client.post(reverse('rate-professor-batch'), {'rating': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RatingUpsertTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        self.data = {'professor': self.professor.id, 'module_instance': self.module_instance.id, 'rating': 5}
+
+    def test_viewset_create_reports_created_then_updated(self):
+        response = self.client.post('/api/api/ratings/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.data['rating'] = 2
+        response = self.client.post('/api/api/ratings/', self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Rating updated successfully')
+
+        rating = Rating.objects.get()
+        self.assertEqual(rating.rating, 2)
+        self.assertLessEqual(rating.created_at, rating.updated_at)
+        self.professor.refresh_from_db()
+        self.assertEqual((self.professor.rating_sum, self.professor.rating_count), (2, 1))
+        self.assertEqual(self.professor.get_average_rating_for_module('CD1'), 2)
+
+    def test_write_path_does_not_look_up_existing_rating(self):
+        self.client.post(reverse('rate-professor'), self.data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('rate-professor'), self.data, format='json')
+        rating_selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "rating_professors_rating"' in query['sql']
+        ]
+        self.assertEqual(rating_selects, [])
+
+    def test_write_path_loads_no_professor_or_module_instance(self):
+        self.client.post(reverse('rate-professor'), self.data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('rate-professor'), self.data, format='json')
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(selects, [])
+
+    def test_unknown_module_instance_is_a_field_error(self):
+        self.data['module_instance'] += 1
+        response = self.client.post(reverse('rate-professor'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('module_instance', response.data)
+
+
+class AssignmentIndexTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        self.data = {'professor': self.professor.id, 'module_instance': self.module_instance.id, 'rating': 5}
+
+    def test_repeat_validation_skips_assignment_query(self):
+        self.client.post(reverse('rate-professor'), self.data, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('rate-professor'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries if 'moduleinstance_professors' in query['sql']])
+
+    def test_assignment_changes_are_seen_immediately(self):
+        self.assertTrue(assignment_index.is_assigned(self.module_instance.id, self.professor.id))
+
+        self.module_instance.professors.remove(self.professor)
+        response = self.client.post(reverse('rate-professor'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.professor.module_instances.add(self.module_instance)
+        response = self.client.post(reverse('rate-professor'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_entries_expire(self):
+        index = AssignmentIndex(max_age=60)
+        with mock.patch('rating_professors.assignments.time.monotonic', return_value=1000.0):
+            self.assertTrue(index.is_assigned(self.module_instance.id, self.professor.id))
+        # Removed behind the index's back, as by another process with a
+        # per-process cache: the version does not move.
+        ModuleInstance.professors.through.objects.filter(moduleinstance_id=self.module_instance.id).delete()
+        with mock.patch('rating_professors.assignments.time.monotonic', return_value=1030.0):
+            self.assertTrue(index.is_assigned(self.module_instance.id, self.professor.id))
+        with mock.patch('rating_professors.assignments.time.monotonic', return_value=1061.0):
+            self.assertFalse(index.is_assigned(self.module_instance.id, self.professor.id))
+
+    def test_index_is_bounded(self):
+        index = AssignmentIndex(max_entries=2)
+        instances = [self.module_instance] + [
+            ModuleInstance.objects.create(module=self.module, year=year, semester=2) for year in (2021, 2022)
+        ]
+        for instance in instances:
+            index.lookup([instance.id])
+        self.assertEqual(index.stats()['assignment_entries'], 2)
+        index.lookup([instances[-1].id])
+        self.assertEqual(index.stats()['assignment_hits'], 1)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('professor-ratings')
+
+    def test_repeat_requests_skip_token_lookup(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'authtoken_token' in query['sql']])
+
+    def test_logout_revokes_immediately(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_revokes_immediately(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_reaches_other_processes(self):
+        self.client.get(self.url)
+        env = {**os.environ, 'TOKEN_CACHE_LOCATION': settings.CACHES['tokens']['LOCATION']}
+        subprocess.run([
+            sys.executable, '-c',
+            f"import django; django.setup(); from rating_professors.authentication import evict_token; evict_token({self.token.key!r})",
+        ], cwd=settings.BASE_DIR, env=env, check=True, timeout=60)
+        Token.objects.filter(pk=self.token.pk).update(key='replaced')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_per_process_cache_is_not_used(self):
+        tokens = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tokens-test'}
+        with override_settings(CACHES={**settings.CACHES, 'tokens': tokens}):
+            self.assertIn('rating_professors.W002', [error.id for error in check_shared_caches(None)])
+            self.client.get(self.url)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url)
+            self.assertTrue([query for query in queries if 'authtoken_token' in query['sql']])
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=4)
+
+    async def test_async_views_match_sync_views(self):
+        headers = {'Authorization': f'Token {self.token.key}'}
+        pairs = [
+            ('module-instance-list', 'async-module-instance-list', []),
+            ('professor-ratings', 'async-professor-ratings', []),
+            ('professor-module-rating', 'async-professor-module-rating', [self.professor.id, self.module.code]),
+        ]
+        for sync_name, async_name, args in pairs:
+            expected = await self.async_client.get(reverse(sync_name, args=args), headers=headers)
+            response = await self.async_client.get(reverse(async_name, args=args), headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+            response = await self.async_client.get(
+                reverse(async_name, args=args), headers={'If-None-Match': response['ETag'], **headers}
+            )
+            self.assertEqual(response.status_code, 304)
+
+    async def test_async_views_require_token(self):
+        response = await self.async_client.get(reverse('async-professor-ratings'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('async-professor-ratings'), headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(READ_REPLICA_ALIAS='replica')
+class ReadReplicaRoutingTests(APITestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()  # drop read-your-writes pins left by earlier tests
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        # The stand-in replica lags behind: it has the professor under an old name.
+        Professor.objects.using('replica').create(
+            id=self.professor.id, name='Professor Stale', email='je1@example.com', department='CS'
+        )
+
+    def test_read_views_use_replica(self):
+        response = self.client.get('/api/api/professors/')
+        self.assertEqual(response.data[0]['name'], 'Professor Stale')
+
+    def test_reads_are_pinned_to_primary_after_a_write(self):
+        data = {'professor': self.professor.id, 'module_instance': self.module_instance.id, 'rating': 5}
+        self.assertEqual(self.client.post(reverse('rate-professor'), data, format='json').status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get('/api/api/professors/')
+        self.assertEqual(response.data[0]['name'], 'Professor J. Excellent')
+        self.assertEqual(response.data[0]['average_rating'], 5)
+
+    def test_conditional_views_read_replica_without_validators(self):
+        Module.objects.using('replica').create(id=self.module.id, code='CD1', title='Stale Title')
+        ModuleInstance.objects.using('replica').create(id=self.module_instance.id, module_id=self.module.id, year=2023, semester=1)
+        for params in ({}, {'stream': 'true'}, {'page_size': 10}):
+            response = self.client.get(reverse('module-instance-list'), params)
+            data = json.loads(b''.join(response.streaming_content)) if response.streaming else response.data
+            rows = data['results'] if 'results' in data else data
+            self.assertEqual(rows[0]['module_title'], 'Stale Title', params)
+            self.assertFalse(response.has_header('ETag'), params)
+
+        response = self.client.get(reverse('professor-ratings'), {'stream': 'true'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content))[0]['name'], 'Professor Stale')
+        self.assertFalse(response.has_header('ETag'))
+        response = self.client.get(reverse('professor-module-rating', args=[self.professor.id, 'CD1']))
+        self.assertEqual(response.data['professor_name'], 'Professor Stale')
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_pinned_reads_get_validators(self):
+        pin_to_primary(self.user)
+        response = self.client.get(reverse('module-instance-list'))
+        self.assertEqual(response.data[0]['module_title'], 'Computing for Dummies')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_writes_and_cached_bodies_use_primary(self):
+        self.assertEqual(router.db_for_write(Professor), 'default')
+        self.assertEqual(router.db_for_read(Professor), 'default')
+        # The shared response cache is filled from the primary.
+        response = self.client.get(reverse('professor-ratings'))
+        self.assertEqual(response.data[0]['name'], 'Professor J. Excellent')
+        self.assertFalse(response.has_header('ETag'))
+
+
+class SQLiteWriteTransactionTests(TransactionTestCase):
+    def test_write_transaction_begins_immediate(self):
+        @write_transaction
+        def write():
+            return Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+
+        with CaptureQueriesContext(connection) as queries:
+            write()
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertFalse(connection.begin_immediate)
+
+    def test_write_transaction_retries_while_locked(self):
+        calls = []
+
+        @write_transaction
+        def write():
+            calls.append(1)
+            Professor.objects.create(name=f'Professor {len(calls)}', email=f'p{len(calls)}@example.com', department='CS')
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        self.assertEqual(write(), 'done')
+        self.assertEqual(len(calls), 2)
+        # The failed attempt was rolled back.
+        self.assertEqual(list(Professor.objects.values_list('name', flat=True)), ['Professor 2'])
+
+    def test_write_transaction_reraises_other_errors(self):
+        @write_transaction
+        def write():
+            raise OperationalError('no such table: nope')
+
+        with self.assertRaises(OperationalError):
+            write()
+
+    def test_concurrent_writers_lose_nothing(self):
+        script = Path(__file__).resolve().parent.parent / 'benchmarks' / 'sqlite_write_stress.py'
+        result = subprocess.run(
+            [sys.executable, str(script), '--processes', '4', '--users', '8', '--instances', '2', '--rounds', '2'],
+            capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+
+class QueryPlanAssertions:
+    """Check that queries on large tables are answered from an index."""
+
+    def assertNoFullScan(self, run, table='rating_professors_rating', allow_index_scan=True):
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        self.assertTrue(queries.captured_queries, "nothing was queried")
+        for query in queries.captured_queries:
+            if table not in query['sql'] or query['sql'].startswith(('SAVEPOINT', 'RELEASE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                # "SCAN t" alone reads every row; "SCAN t USING INDEX" walks an index in order.
+                self.assertFalse(step == f'SCAN {table}', f"full table scan in {query['sql']}: {plan}")
+                if not allow_index_scan:
+                    self.assertFalse(step.startswith(f'SCAN {table}'), f"full index scan in {query['sql']}: {plan}")
+                self.assertNotIn('TEMP B-TREE', step, f"sort without an index in {query['sql']}: {plan}")
+
+
+class RatingQueryPlanTests(QueryPlanAssertions, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=4)
+
+    def test_professor_module_ratings_use_index(self):
+        self.assertNoFullScan(lambda: Rating.objects.filter(
+            professor=self.professor, module_instance__module__code=self.module.code
+        ).aggregate(Avg('rating')))
+
+    def test_user_ratings_use_index(self):
+        self.assertNoFullScan(lambda: self.client.get('/api/api/ratings/', {'page_size': 10}))
+        self.assertNoFullScan(lambda: list(Rating.objects.filter(user=self.user)))
+
+    def test_admin_ordering_uses_index(self):
+        self.assertNoFullScan(lambda: list(Rating.objects.order_by('-created_at')[:100]))
+
+    def test_last_updated_uses_index(self):
+        self.assertNoFullScan(lambda: Rating.objects.aggregate(Max('updated_at')))
+
+    def test_conditional_get_reads_no_whole_index(self):
+        for url, table in ((reverse('professor-ratings'), 'rating_professors_rating'),
+                           (reverse('module-instance-list'), 'rating_professors_moduleinstance')):
+            etag = self.client.get(url)['ETag']
+            self.assertNoFullScan(lambda: self.client.get(url, HTTP_IF_NONE_MATCH=etag), table=table, allow_index_scan=False)
+
+
+PERF_BASELINE_FILE = Path(__file__).resolve().parent / 'perf_baseline.json'
+PERF_DATASET_SIZES = [int(size) for size in os.environ.get('PERF_DATASET_SIZES', '10,1000,100000').split(',')]
+
+
+def seed_performance_dataset(size):
+    """Create ``size`` ratings over a catalogue that grows with the square root of it.
+
+    Every user rates every assigned (instance, professor) pair in the same
+    order, so the first user and the first pair always have ratings.
+    """
+    instance_count = max(2, round(math.sqrt(size) / 5))
+    professors = Professor.objects.bulk_create(
+        Professor(name=f'Professor {i}', email=f'perf{i}@example.com', department='CS')
+        for i in range(instance_count)
+    )
+    modules = Module.objects.bulk_create(
+        Module(code=f'PF{i}', title=f'Module {i}') for i in range(math.ceil(instance_count / 2))
+    )
+    instances = ModuleInstance.objects.bulk_create(
+        ModuleInstance(module=modules[i // 2], year=2023, semester=i % 2 + 1) for i in range(instance_count)
+    )
+    ModuleInstance.professors.through.objects.bulk_create(
+        ModuleInstance.professors.through(moduleinstance_id=instance.id, professor_id=professors[(i + k) % instance_count].id)
+        for i, instance in enumerate(instances) for k in range(min(3, instance_count))
+    )
+    pairs = [
+        (instance, professors[(i + k) % instance_count])
+        for i, instance in enumerate(instances) for k in range(min(3, instance_count))
+    ]
+    users = User.objects.bulk_create(
+        User(username=f'perf{i}', password='!') for i in range(math.ceil(size / len(pairs)))
+    )
+    Rating.objects.bulk_create(
+        (
+            Rating(user=users[n // len(pairs)], module_instance=pairs[n % len(pairs)][0],
+                   professor=pairs[n % len(pairs)][1], rating=n % 5 + 1)
+            for n in range(size)
+        ),
+        batch_size=1000,
+    )
+    rebuild_rating_aggregates()
+
+    user = users[0]
+    user.set_password('testpassword')
+    user.is_staff = True
+    user.save()
+    instance, professor = pairs[0]
+    return {
+        'user': user,
+        'token': Token.objects.create(user=user).key,
+        'professor': professor,
+        'module': instance.module,
+        'instance': instance,
+        'rating': Rating.objects.filter(user=user).earliest('id'),
+    }
+
+
+def performance_endpoints(data):
+    """(name, method, path, payload) for every route in rating_professors/urls.py."""
+    professor, module, instance, rating = data['professor'], data['module'], data['instance'], data['rating']
+    rate = {'professor': professor.id, 'module_instance': instance.id, 'rating': 3}
+    return [
+        ('register', 'post', reverse('register'), {'username': 'perf-new', 'email': 'new@example.com', 'password': 'pw'}),
+        ('login', 'post', reverse('login'), {'username': data['user'].username, 'password': 'testpassword'}),
+        ('module-instance-list', 'get', reverse('module-instance-list'), None),
+        ('professor-ratings', 'get', reverse('professor-ratings'), None),
+        ('professor-module-rating', 'get', reverse('professor-module-rating', args=[professor.id, module.code]), None),
+        ('module-instance-lookup', 'get', reverse('module-instance-lookup'),
+         {'module_code': module.code, 'year': instance.year, 'semester': instance.semester}),
+        ('rate-professor', 'post', reverse('rate-professor'), rate),
+        ('rate-professor-by-code', 'post', reverse('rate-professor-by-code'),
+         {'professor': professor.id, 'module_code': module.code, 'year': instance.year, 'semester': instance.semester, 'rating': 3}),
+        ('rate-professor-batch', 'post', reverse('rate-professor-batch'), [rate] * 5),
+        ('cache-stats', 'get', reverse('cache-stats'), None),
+        ('ratings-export', 'get', reverse('ratings-export'), None),
+        ('async-module-instance-list', 'get', reverse('async-module-instance-list'), None),
+        ('async-professor-ratings', 'get', reverse('async-professor-ratings'), None),
+        ('async-professor-module-rating', 'get', reverse('async-professor-module-rating', args=[professor.id, module.code]), None),
+        ('api-root', 'get', reverse('api-root'), None),
+        ('professor-list', 'get', reverse('professor-list'), None),
+        ('professor-detail', 'get', reverse('professor-detail', args=[professor.id]), None),
+        ('moduleinstance-list', 'get', reverse('moduleinstance-list'), None),
+        ('moduleinstance-detail', 'get', reverse('moduleinstance-detail', args=[instance.id]), None),
+        ('rating-list', 'get', reverse('rating-list'), None),
+        ('rating-create', 'post', reverse('rating-list'), rate),
+        ('rating-detail', 'get', reverse('rating-detail', args=[rating.id]), None),
+        ('rating-update', 'patch', reverse('rating-detail', args=[rating.id]), {'rating': 2}),
+        ('rating-destroy', 'delete', reverse('rating-detail', args=[rating.id]), None),
+        ('logout', 'post', reverse('logout'), None),
+    ]
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointPerformanceTests(TestCase):
+    """Query counts and wall time of every endpoint against growing datasets.
+
+    Each endpoint is hit with cold caches. The suite fails when an
+    endpoint's query count grows with the dataset or goes past the count in
+    perf_baseline.json. Wall time depends on the machine, so it is only
+    checked with PERF_CHECK_LATENCY=1: then the suite also fails when an
+    endpoint takes longer than the baseline by more than PERF_TIME_TOLERANCE
+    (default 5x, never under 250ms). Regenerate the baseline with
+    PERF_UPDATE_BASELINE=1.
+    """
+
+    def measure(self, size):
+        with transaction.atomic():
+            data = seed_performance_dataset(size)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {data['token']}")
+            results = {}
+            for name, method, path, payload in performance_endpoints(data):
+                cache.clear()
+                caches['tokens'].clear()
+                assignment_index.invalidate()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, payload, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                self.assertLess(response.status_code, 400, f"{name} at {size} ratings: {response.status_code}")
+                results[name] = {'queries': len(queries), 'seconds': elapsed}
+            transaction.set_rollback(True)
+        return results
+
+    def test_endpoint_query_counts_and_latency(self):
+        runs = {size: self.measure(size) for size in sorted(PERF_DATASET_SIZES)}
+        smallest, largest = runs[min(runs)], runs[max(runs)]
+
+        if os.environ.get('PERF_UPDATE_BASELINE'):
+            baseline = {
+                name: {
+                    'queries': max(run[name]['queries'] for run in runs.values()),
+                    'seconds': round(max(run[name]['seconds'] for run in runs.values()), 4),
+                }
+                for name in smallest
+            }
+            PERF_BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        baseline = json.loads(PERF_BASELINE_FILE.read_text())
+        check_latency = bool(os.environ.get('PERF_CHECK_LATENCY'))
+        tolerance = float(os.environ.get('PERF_TIME_TOLERANCE', 5))
+
+        for name in smallest:
+            with self.subTest(endpoint=name):
+                counts = {size: run[name]['queries'] for size, run in runs.items()}
+                self.assertLessEqual(largest[name]['queries'], smallest[name]['queries'],
+                                     f"query count grows with the dataset: {counts}")
+                self.assertLessEqual(max(counts.values()), baseline[name]['queries'],
+                                     f"more queries than the baseline: {counts}")
+                if not check_latency:
+                    continue
+                limit = max(baseline[name]['seconds'] * tolerance, 0.25)
+                self.assertLessEqual(largest[name]['seconds'], limit,
+                                     f"{largest[name]['seconds']:.3f}s at {max(runs)} ratings")
+
+    def test_token_cache_against_lookup(self):
+        # Before/after for CachedTokenAuthentication: a hit unpickles an
+        # entry from the tokens cache instead of querying token and user,
+        # and a miss pays for the lookup plus the cache write (and cull).
+        data = seed_performance_dataset(10)
+        key, tokens = data['token'], caches['tokens']
+        uncached, cached = TokenAuthentication(), CachedTokenAuthentication()
+
+        def median_seconds(call, repeat=200):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                call()
+                timings.append(time.perf_counter() - started)
+            return sorted(timings)[repeat // 2]
+
+        def miss():
+            tokens.clear()
+            cached.authenticate_credentials(key)
+
+        lookup = median_seconds(lambda: uncached.authenticate_credentials(key))
+        missed = median_seconds(miss)
+        cached.authenticate_credentials(key)
+        with CaptureQueriesContext(connection) as queries:
+            hit = median_seconds(lambda: cached.authenticate_credentials(key))
+        self.assertEqual(len(queries), 0)
+
+        timings = f"lookup {lookup * 1e6:.0f}us, cache hit {hit * 1e6:.0f}us, cache miss {missed * 1e6:.0f}us"
+        if os.environ.get('PERF_CHECK_LATENCY'):
+            self.assertLessEqual(hit, lookup, timings)
+
+
+class SeedRatingsCommandTests(TestCase):
+    options = dict(professors=12, modules=4, instances=10, students=15, ratings=200, seed=7, stdout=StringIO())
+
+    def snapshot(self):
+        return list(Rating.objects.order_by('user__username', 'module_instance__module__code', 'module_instance__year',
+                                            'module_instance__semester', 'professor__email').values_list(
+            'user__username', 'module_instance__module__code', 'module_instance__year',
+            'module_instance__semester', 'professor__email', 'rating'))
+
+    def test_seeds_requested_sizes_with_consistent_aggregates(self):
+        out = StringIO()
+        call_command('seed_ratings', **{**self.options, 'stdout': out})
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(Professor.objects.count(), 12)
+        self.assertEqual(ModuleInstance.objects.count(), 10)
+        self.assertEqual(Rating.objects.count(), 200)
+        self.assertEqual(ModuleInstance.professors.through.objects.count(), 30)
+        # Every rating is by a student of the instance, for one of its professors.
+        for rating in Rating.objects.select_related('module_instance'):
+            self.assertTrue(rating.module_instance.students.filter(pk=rating.user_id).exists())
+            self.assertTrue(rating.module_instance.professors.filter(pk=rating.professor_id).exists())
+        self.assertEqual(sum(Professor.objects.values_list('rating_count', flat=True)), 200)
+        self.assertEqual(sum(ProfessorModuleRating.objects.values_list('rating_sum', flat=True)),
+                         sum(Rating.objects.values_list('rating', flat=True)))
+
+    def test_same_seed_gives_same_data(self):
+        call_command('seed_ratings', **self.options)
+        first = self.snapshot()
+        call_command('seed_ratings', flush=True, **self.options)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(Rating.objects.count(), 200)
+
+    def test_flush_deletes_ratings_in_one_statement(self):
+        call_command('seed_ratings', **self.options)
+        with CaptureQueriesContext(connection) as queries, mock.patch.object(post_delete, 'disconnect') as disconnect:
+            SeedRatingsCommand(stdout=StringIO()).flush()
+        disconnect.assert_not_called()
+        rating_queries = [query['sql'] for query in queries if 'FROM "rating_professors_rating"' in query['sql']]
+        # One DELETE, before the cascades from professors and instances find nothing left.
+        self.assertTrue(rating_queries[0].startswith('DELETE'))
+        self.assertEqual(len([sql for sql in rating_queries if sql.startswith('DELETE')]), 1)
+        self.assertFalse(Rating.objects.exists())
+        self.assertTrue(post_delete.has_listeners(Rating))
+
+        # The reseeded ids start after the flushed ones; the estimate still matches.
+        call_command('seed_ratings', **self.options)
+        self.assertEqual(EstimatedCountPaginator.estimate(Rating.objects.all()), 200)
+
+    def test_refuses_impossible_sizes(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_ratings', **{**self.options, 'ratings': 10 * 3 * 15 + 1})
+
+
+class ImportCatalogueCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def import_catalogue(self, kind, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_catalogue', kind, path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def import_all(self):
+        self.import_catalogue('professors', self.write('professors.csv', (
+            "name,email,department\n"
+            "Professor J. Excellent,je1@example.com,CS\n"
+            "Professor V. Good,vg1@example.com,Maths\n"
+        )))
+        self.import_catalogue('modules', self.write('modules.jsonl', (
+            '{"code": "CD1", "title": "Computing for Dummies", "credits": 20}\n'
+            '{"code": "PG1", "title": "Programming for the Gifted"}\n'
+        )))
+        self.import_catalogue('instances', self.write('instances.csv', (
+            "module,year,semester\nCD1,2023,1\nCD1,2024,2\nPG1,2023,1\n"
+        )))
+        return self.import_catalogue('assignments', self.write('assignments.csv', (
+            "module,year,semester,professor\n"
+            "CD1,2023,1,je1@example.com\nCD1,2023,1,vg1@example.com\nPG1,2023,1,vg1@example.com\n"
+        )))
+
+    def test_imports_catalogue(self):
+        out, err = self.import_all()
+        self.assertIn('3 created', out)
+        self.assertEqual(err, '')
+        self.assertEqual(Module.objects.get(code='CD1').credits, 20)
+        self.assertEqual(Module.objects.get(code='PG1').credits, 10)
+        instance = ModuleInstance.objects.get(module__code='CD1', year=2023, semester=1)
+        self.assertEqual(set(instance.professors.values_list('email', flat=True)), {'je1@example.com', 'vg1@example.com'})
+
+    def test_reimport_of_unchanged_data_writes_nothing(self):
+        self.import_all()
+        with CaptureQueriesContext(connection) as queries:
+            out, _ = self.import_all()
+        self.assertIn('0 created, 0 updated, 3 unchanged', out)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+    def test_updates_changed_rows_with_constant_queries(self):
+        self.import_all()
+        rows = ''.join(f"Professor {i},p{i}@example.com,CS\n" for i in range(200))
+        path = self.write('more.csv', "name,email,department\nProfessor J. Excellent,je1@example.com,Physics\n" + rows)
+        with CaptureQueriesContext(connection) as queries:
+            out, _ = self.import_catalogue('professors', path)
+        self.assertIn('200 created, 1 updated', out)
+        self.assertEqual(Professor.objects.get(email='je1@example.com').department, 'Physics')
+        self.assertLess(len(queries), 15)
+
+    def test_reports_bad_rows_and_keeps_going(self):
+        self.import_all()
+        _, err = self.import_catalogue('instances', self.write('bad.csv', (
+            "module,year,semester\nNOPE,2023,1\nCD1,1999,1\nCD1,x,1\nPG1,2024,2\n"
+        )))
+        self.assertIn("line 2: unknown module 'NOPE'", err)
+        self.assertIn('line 3:', err)
+        self.assertIn('line 4:', err)
+        self.assertTrue(ModuleInstance.objects.filter(module__code='PG1', year=2024, semester=2).exists())
+
+    def test_reports_short_csv_rows(self):
+        out, err = self.import_catalogue('professors', self.write('short.csv', (
+            "name,email,department\nProfessor Short,ps@example.com\nProfessor V. Good,vg1@example.com,Maths\n"
+        )))
+        self.assertIn("line 2: missing 'department'", err)
+        self.assertIn('1 created', out)
+        self.assertIn('1 errors', out)
+
+    def test_reports_null_and_nested_jsonl_fields(self):
+        self.import_all()
+        out, err = self.import_catalogue('modules', self.write('bad.jsonl', (
+            '{"code": "NL1", "title": null}\n'
+            '{"code": ["NL2"], "title": "Nested"}\n'
+            '{"code": 42, "title": "Numbered"}\n'
+        )))
+        self.assertIn("line 1: missing 'title'", err)
+        self.assertIn("line 2: 'code' must be a single value", err)
+        self.assertEqual(Module.objects.get(code='42').title, 'Numbered')
+        self.assertIn('2 errors', out)
+
+
+class RatingExportTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='analyst', password='testpassword', is_staff=True)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        self.module_instance.professors.add(self.professor)
+        self.old = Rating.objects.create(user=self.staff, professor=self.professor, module_instance=self.module_instance, rating=5)
+        Rating.objects.filter(pk=self.old.pk).update(updated_at='2020-01-01T00:00:00Z')
+        self.new = Rating.objects.create(user=self.user, professor=self.professor, module_instance=self.module_instance, rating=2)
+
+    def test_command_exports_csv(self):
+        out = StringIO()
+        call_command('export_ratings', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,user,professor_id,professor,module_code,year,semester,rating,created_at,updated_at')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(f'{self.old.id},analyst,{self.professor.id},Professor J. Excellent,CD1,2023,1,5,'))
+
+    def test_command_exports_jsonl_since(self):
+        out = StringIO()
+        call_command('export_ratings', format='jsonl', since='2021-01-01', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.new.id])
+        self.assertEqual(rows[0]['module_code'], 'CD1')
+        self.assertEqual(rows[0]['user'], 'testuser')
+
+    def test_endpoint_streams_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('ratings-export'), {'output': 'jsonl'})
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'application/jsonl; charset=utf-8')
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertEqual(len([q for q in queries.captured_queries if 'rating_professors_rating' in q['sql']]), 1)
+
+    def test_endpoint_filters_since(self):
+        response = self.client.get(reverse('ratings-export'), {'since': '2021-01-01T00:00:00Z'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.new.id},'))
+        self.assertEqual(self.client.get(reverse('ratings-export'), {'since': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(reverse('ratings-export')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='testpassword', email='admin@example.com')
+        self.client.force_login(self.admin)
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.created = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            i = self.created
+            self.created += 1
+            professor = Professor.objects.create(name=f'Professor {i}', email=f'p{i}@example.com', department='CS')
+            instance = ModuleInstance.objects.create(module=self.module, year=2000 + i, semester=1)
+            instance.professors.add(professor)
+            user = User.objects.create(username=f'student{i}')
+            Rating.objects.create(user=user, professor=professor, module_instance=instance, rating=i % 5 + 1)
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:rating_professors_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_rows(2)
+        few = {model: self.changelist_queries(model) for model in ('professor', 'moduleinstance', 'rating')}
+        self.add_rows(20)
+        many = {model: self.changelist_queries(model) for model in ('professor', 'moduleinstance', 'rating')}
+        self.assertEqual(many, few)
+
+    def test_professors_sort_by_average_rating(self):
+        self.add_rows(5)
+        response = self.client.get(reverse('admin:rating_professors_professor_changelist'), {'o': '-4'})
+        averages = [professor.get_average_rating() for professor in response.context['cl'].result_list]
+        self.assertEqual(averages, sorted(averages, reverse=True))
+        self.assertEqual(averages[0], 5)
+
+    def test_large_unfiltered_tables_use_an_estimated_count(self):
+        self.add_rows(4)
+        Rating.objects.filter(pk=Rating.objects.order_by('pk').first().pk).delete()
+        paginator = EstimatedCountPaginator(Rating.objects.order_by('-created_at'), 100)
+        paginator.exact_count_below = 1
+        with CaptureQueriesContext(connection) as queries:
+            # The oldest row went, so the id span still matches the count.
+            self.assertEqual(paginator.count, Rating.objects.count())
+        self.assertNotIn('COUNT', queries.captured_queries[0]['sql'])
+
+        # Rows deleted from the middle are the estimate's only error.
+        Rating.objects.order_by('pk')[1].delete()
+        del paginator.count
+        self.assertEqual(paginator.count, Rating.objects.count() + 1)
+
+        filtered = EstimatedCountPaginator(Rating.objects.filter(rating__gte=1).order_by('pk'), 100)
+        filtered.exact_count_below = 1
+        self.assertEqual(filtered.count, 2)
+
+
+class NaturalKeyRatingTests(QueryPlanAssertions, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.professor = Professor.objects.create(name='Professor J. Excellent', email='je1@example.com', department='CS')
+        self.other = Professor.objects.create(name='Professor V. Good', email='vg1@example.com', department='CS')
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        self.module_instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=1)
+        ModuleInstance.objects.create(module=self.module, year=2023, semester=2)
+        self.module_instance.professors.add(self.professor)
+
+    def test_lookup_module_instance(self):
+        url = reverse('module-instance-lookup')
+        response = self.client.get(url, {'module_code': 'CD1', 'year': 2023, 'semester': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.module_instance.id)
+        self.assertEqual(response.data['professors'][0]['name'], 'Professor J. Excellent')
+        self.assertEqual(self.client.get(url, {'module_code': 'CD1', 'year': 2024, 'semester': 1}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url, {'module_code': 'CD1'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lookup_uses_index(self):
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse('module-instance-lookup'), {'module_code': 'CD1', 'year': 2023, 'semester': 1}),
+            table='rating_professors_moduleinstance',
+        )
+
+    def test_rate_by_natural_key(self):
+        data = {'professor': self.professor.id, 'module_code': 'CD1', 'year': 2023, 'semester': 1, 'rating': 5}
+        response = self.client.post(reverse('rate-professor-by-code'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        rating = Rating.objects.get(user=self.user)
+        self.assertEqual((rating.module_instance_id, rating.rating), (self.module_instance.id, 5))
+
+    def test_rate_by_natural_key_rejects_unknown_or_unassigned(self):
+        url = reverse('rate-professor-by-code')
+        data = {'professor': self.professor.id, 'module_code': 'XX9', 'year': 2023, 'semester': 1, 'rating': 5}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Module instance not found.', response.data['non_field_errors'])
+        data = {'professor': self.other.id, 'module_code': 'CD1', 'year': 2023, 'semester': 1, 'rating': 5}
+        self.assertEqual(self.client.post(url, data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Rating.objects.exists())
+
+
+class SingleThreadedWSGIServer(WSGIServer):
+    # The in-memory test database is one connection shared with the server,
+    # so requests must not run on several threads at once.
+    def __init__(self, *args, connections_override=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+class SingleThreadedLiveServerThread(LiveServerThread):
+    server_class = SingleThreadedWSGIServer
+
+
+class ClientBulkModeTests(LiveServerTestCase):
+    server_thread_class = SingleThreadedLiveServerThread
+    client_script = Path(__file__).resolve().parent.parent / 'client.py'
+
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.addCleanup(self.home.cleanup)
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        token = Token.objects.create(user=user)
+        Path(self.home.name, '.professor_rating_credentials.json').write_text(json.dumps({'token': token.key}))
+
+        self.professors = [
+            Professor.objects.create(name=f'Professor {i}', email=f'p{i}@example.com', department='CS') for i in range(3)
+        ]
+        self.module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        for semester in (1, 2):
+            instance = ModuleInstance.objects.create(module=self.module, year=2023, semester=semester)
+            instance.professors.add(*self.professors)
+
+    def write_csv(self, name, lines):
+        path = Path(self.home.name, name)
+        path.write_text('\n'.join(lines) + '\n')
+        return str(path)
+
+    def run_client(self, *args):
+        env = {**os.environ, 'HOME': self.home.name, 'PROFESSOR_RATING_URL': f'{self.live_server_url}/api/'}
+        result = subprocess.run(
+            [sys.executable, str(self.client_script), *args], env=env, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout, result.stderr
+
+    def test_bulk_rate_and_average(self):
+        rows = ['professor,module_code,year,semester,rating']
+        rows += [f'{professor.id},CD1,2023,{semester},{professor.id % 5 + 1}'
+                 for professor in self.professors for semester in (1, 2)]
+        rows += [f'{self.professors[0].id},XX9,2023,1,5', f'{self.professors[0].id},CD1,2023,1,9']
+        out, summary = self.run_client('--json', 'rate', '--file', self.write_csv('ratings.csv', rows), '--workers', '4')
+        results = [json.loads(line) for line in out.splitlines()]
+
+        self.assertEqual(sorted(result['line'] for result in results), list(range(2, 2 + len(rows) - 1)))
+        self.assertEqual(sum(result['ok'] for result in results), 6)
+        self.assertIn('8 requests', summary)
+        self.assertIn('6 succeeded, 2 failed', summary)
+        self.assertIn('2 x 400', summary)
+        self.assertEqual(Rating.objects.count(), 6)
+
+        pairs = ['professor,module_code'] + [f'{professor.id},CD1' for professor in self.professors] + ['999,CD1']
+        out, summary = self.run_client('--json', 'average', '--file', self.write_csv('pairs.csv', pairs))
+        results = [json.loads(line) for line in out.splitlines()]
+        averages = {result['result']['professor_id']: result['result']['average_rating'] for result in results if result['ok']}
+        self.assertEqual(averages, {professor.id: professor.id % 5 + 1 for professor in self.professors})
+        self.assertIn('3 succeeded, 1 failed', summary)
+        self.assertIn('1 x 404', summary)
+
+    def test_bulk_file_missing_columns(self):
+        out, _ = self.run_client('rate', '--file', self.write_csv('bad.csv', ['professor,rating', '1,5']))
+        self.assertIn('missing columns: module_code, semester, year', out)
+
+    def test_repeated_reads_revalidate_from_cache(self):
+        _, timing = self.run_client('--timing', 'view')
+        self.assertIn('GET       200', timing)
+        _, timing = self.run_client('--timing', 'view')
+        self.assertIn('GET       304', timing)
+        _, timing = self.run_client('--no-cache', '--timing', 'view')
+        self.assertNotIn('304', timing)
+
+
+def load_client_module():
+    spec = importlib.util.spec_from_file_location('client', ClientBulkModeTests.client_script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+
+class ClientResponseCacheTests(SimpleTestCase):
+    url = 'http://testserver/api/professors/'
+    headers = {'Authorization': 'Token abc'}
+
+    def setUp(self):
+        self.client_module = load_client_module()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.client_module.CACHE_DIR = self.cache_dir.name
+
+    def cached_get(self, *responses, headers=None):
+        with mock.patch.object(self.client_module, 'api_request', side_effect=responses) as api_request:
+            result = self.client_module.cached_get(self.url, headers or self.headers)
+        return result, api_request
+
+    def test_revalidates_stored_copy(self):
+        (_, data), _ = self.cached_get(FakeResponse(200, {'n': 1}, {'ETag': '"v1"'}))
+        self.assertEqual(data, {'n': 1})
+        (response, data), api_request = self.cached_get(FakeResponse(304))
+        self.assertEqual((response.status_code, data), (304, {'n': 1}))
+        self.assertEqual(api_request.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(api_request.call_args.kwargs['timeout'], self.client_module.CACHE_TIMEOUT)
+
+    def test_falls_back_to_stored_copy_when_server_is_slow(self):
+        self.cached_get(FakeResponse(200, {'n': 1}, {'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}))
+        with mock.patch('sys.stderr', new_callable=StringIO) as stderr:
+            (response, data), _ = self.cached_get(self.client_module.requests.exceptions.ReadTimeout())
+        self.assertEqual((response, data), (None, {'n': 1}))
+        self.assertIn('cached copy', stderr.getvalue())
+        with self.assertRaises(self.client_module.requests.exceptions.ReadTimeout):
+            self.cached_get(self.client_module.requests.exceptions.ReadTimeout(), headers={'Authorization': 'Token xyz'})
+
+    def test_entries_are_per_user(self):
+        self.cached_get(FakeResponse(200, {'user': 'abc'}, {'ETag': '"a"'}))
+        (_, data), api_request = self.cached_get(FakeResponse(200, {'user': 'xyz'}), headers={'Authorization': 'Token xyz'})
+        self.assertEqual(data, {'user': 'xyz'})
+        self.assertNotIn('If-None-Match', api_request.call_args.kwargs['headers'])
+
+    def test_evicts_least_recently_used(self):
+        for n in range(3):
+            self.client_module.save_cache_entry(
+                self.client_module.cache_path(f'{self.url}?n={n}', self.headers), {'etag': '"x"', 'data': 'x' * 100}
+            )
+        paths = sorted(Path(self.cache_dir.name).iterdir())
+        # Used in the order paths[1], paths[2], paths[0]
+        for age, path in zip((1, 3, 2), paths):
+            os.utime(path, (time.time() - age, time.time() - age))
+        self.client_module.evict_cache(max_bytes=2 * paths[0].stat().st_size)
+        self.assertEqual(sorted(Path(self.cache_dir.name).iterdir()), sorted([paths[0], paths[2]]))
+
+    def test_no_cache_stores_nothing(self):
+        self.client_module.USE_CACHE = False
+        (_, data), api_request = self.cached_get(FakeResponse(200, {'n': 1}, {'ETag': '"v1"'}))
+        self.assertEqual(data, {'n': 1})
+        self.assertEqual(list(Path(self.cache_dir.name).iterdir()), [])
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2024, 1, 2),
+        'average': decimal.Decimal('3.50'),
+        'name': 'Professor J. \u00c9lodie \u2028',
+        'ids': (1, 2, 3),
+        1: None,
+    }
+
+    def test_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(renderers.dumps(self.data), expected.decode().replace('\\u2028', '\u2028'))
+
+    def test_indented_and_oversized_output_fall_back(self):
+        renderer = renderers.FastJSONRenderer()
+        self.assertEqual(
+            renderer.render({'a': 1}, 'application/json; indent=2'), JSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        )
+        self.assertEqual(renderer.render({'big': 2 ** 70}), b'{"big":%d}' % 2 ** 70)
+
+    def test_parser(self):
+        parser = renderers.FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"name": "\u00c9"}'.encode())), {'name': '\u00c9'})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"name": '))
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        module = Module.objects.create(code='CD1', title='Computing for Dummies')
+        professor = Professor.objects.create(name='Professor J. Excellent', email='jex@example.com', department='CS')
+        for year in range(2000, 2030):
+            ModuleInstance.objects.create(module=module, year=year, semester=1).professors.add(professor)
+        self.url = reverse('module-instance-list')
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_streams_are_gzipped(self):
+        plain = b''.join(self.client.get(self.url, {'stream': 'true'}).streaming_content)
+        response = self.client.get(self.url, {'stream': 'true'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_small_or_refused_responses_are_not_compressed(self):
+        response = self.client.get(reverse('professor-ratings'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_negotiation(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('br, identity'))
+        with mock.patch.object(compression, 'brotli', object()):
+            self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'br')
+            self.assertEqual(compression.choose_encoding('gzip, br;q=0.5'), 'gzip')
+            self.assertEqual(compression.choose_encoding('*'), 'br')
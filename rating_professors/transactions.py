@@ -0,0 +1,41 @@
+import random
+import time
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+WRITE_RETRIES = 5
+RETRY_BACKOFF = 0.05
+
+
+def _is_locked(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def write_transaction(func):
+    """Run a view handler in one write transaction, retrying while SQLite is locked.
+
+    The transaction starts with BEGIN IMMEDIATE so the write lock is taken
+    before anything is read. If it still cannot be had within the busy
+    timeout, the whole handler is retried with jittered exponential backoff.
+    Inside an existing atomic block the handler just runs as is.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return func(*args, **kwargs)
+
+        for attempt in range(WRITE_RETRIES):
+            try:
+                connection.begin_immediate = True
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    connection.begin_immediate = False
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not _is_locked(exc) or attempt == WRITE_RETRIES - 1:
+                    raise
+            finally:
+                connection.begin_immediate = False
+            time.sleep(RETRY_BACKOFF * 2 ** attempt * (1 + random.random()))
+    return wrapper
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     RegisterView, LoginView, LogoutView,
-    ModuleInstanceListView, ProfessorRatingsView,
-    ProfessorModuleRatingView, RateProfessorView,
+    ModuleInstanceListView, ModuleInstanceLookupView, ProfessorRatingsView,
+    ProfessorModuleRatingView, RateProfessorView, RateProfessorByCodeView, RateProfessorBatchView, CacheStatsView, RatingExportView,
     ProfessorViewSet, ModuleInstanceViewSet, RatingViewSet
 )
 
@@ -17,8 +18,16 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('module-instances/', ModuleInstanceListView.as_view(), name='module-instance-list'),
+    path('module-instances/lookup/', ModuleInstanceLookupView.as_view(), name='module-instance-lookup'),
     path('professor-ratings/', ProfessorRatingsView.as_view(), name='professor-ratings'),  # Add this line
     path('professor-module-rating/<int:professor_id>/<str:module_code>/', ProfessorModuleRatingView.as_view(), name='professor-module-rating'),
     path('rate-professor/', RateProfessorView.as_view(), name='rate-professor'),
+    path('rate-professor/by-code/', RateProfessorByCodeView.as_view(), name='rate-professor-by-code'),
+    path('rate-professor/batch/', RateProfessorBatchView.as_view(), name='rate-professor-batch'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('ratings/export/', RatingExportView.as_view(), name='ratings-export'),
+    path('async/module-instances/', async_views.module_instance_list, name='async-module-instance-list'),
+    path('async/professor-ratings/', async_views.professor_ratings, name='async-professor-ratings'),
+    path('async/professor-module-rating/<int:professor_id>/<str:module_code>/', async_views.professor_module_rating, name='async-professor-module-rating'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,9 +1,11 @@
 from django.shortcuts import get_object_or_404, render, redirect, HttpResponse
+from django.http import StreamingHttpResponse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Avg, IntegerField
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import IntegerField, Max
 from django.db.models.functions import Cast, Round
 from django.views.generic import View, ListView
 from django.contrib.auth.views import LoginView, LogoutView
@@ -14,20 +16,30 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.parsers import JSONParser
 from rest_framework.decorators import api_view
 
-from .models import Professor, Module, ModuleInstance, Rating
+from .models import Professor, Module, ModuleInstance, Rating, ProfessorModuleRating
+from .assignments import assignment_index
+from .cache import CATALOGUE, RATINGS, cache_stats, get_or_build, get_version, get_version_time
+from .conditional import conditional_response
+from .exports import EXPORT_FORMATS, export_queryset, export_ratings, parse_since
+from .routers import ReplicaReadMixin, reads_replica
+from .pagination import OptionalCursorPagination, RatingCursorPagination
+from .renderers import FastJSONParser
+from .services import submit_ratings
+from .streaming import STREAM_CHUNK_SIZE, wants_stream, streaming_json_response
+from .transactions import write_transaction
 from .serializers import (
     UserSerializer, ProfessorSerializer, ModuleSerializer,
-    ModuleInstanceSerializer, RatingSerializer, CreateRatingSerializer, ProfessorModuleRatingSerializer
+    ModuleInstanceSerializer, RatingSerializer, CreateRatingSerializer, CreateRatingByCodeSerializer,
+    ProfessorModuleRatingSerializer, BatchRatingItemSerializer
 )
 
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
-    parser_classes = [JSONParser]
+    parser_classes = [FastJSONParser]
 
     def post(self, request, *args, **kwargs):
         print("Recieved Data: ", request.data)
@@ -79,39 +91,171 @@ class LogoutView(APIView):
         return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
 
 
-class ModuleInstanceListView(APIView):
+# Conditional GETs are only answered from the primary. The validators
+# include the cache version, which moves as soon as the primary is written;
+# a body from a lagging replica would go out under that current validator
+# and keep getting 304s after the replica caught up. Reads routed to the
+# replica are sent in full, without validators.
+class ModuleInstanceListView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        module_instances = ModuleInstance.objects.all()
+        if reads_replica(ModuleInstance):
+            return self.list(request)
+        # Every write replaces the version; the primary key index answers
+        # max(id) without a scan, unlike a count.
+        last_id = ModuleInstance.objects.aggregate(last_id=Max('id'))['last_id']
+        validator = f"{get_version(CATALOGUE)}:{last_id}"
+        return conditional_response(request, validator, get_version_time(CATALOGUE), lambda: self.list(request))
+
+    def list(self, request):
+        module_instances = ModuleInstance.objects.for_listing()
+        if wants_stream(request):
+            # Streamed after dispatch has reset the routing.
+            module_instances = module_instances.using(module_instances.db)
+            return streaming_json_response(
+                ModuleInstanceSerializer(instance).data
+                for instance in module_instances.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            )
+
+        paginator = OptionalCursorPagination()
+        page = paginator.paginate_queryset(module_instances, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(ModuleInstanceSerializer(page, many=True).data)
+
         serializer = ModuleInstanceSerializer(module_instances, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+# Module Instance Lookup View
+class ModuleInstanceLookupView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            module_code = request.query_params['module_code']
+            year = int(request.query_params['year'])
+            semester = int(request.query_params['semester'])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "module_code, year and semester are required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # Served by the unique (module, year, semester) index.
+        module_instance = get_object_or_404(
+            ModuleInstance.objects.for_listing(), module__code=module_code, year=year, semester=semester
+        )
+        return Response(ModuleInstanceSerializer(module_instance).data, status=status.HTTP_200_OK)
+
 # Professor Ratings View
-class ProfessorRatingsView(APIView):
+class ProfessorRatingsView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @staticmethod
+    def professor_rating(professor):
+        return {
+            'id': professor['id'],
+            'name': professor['name'],
+            'average_rating': professor['rating_sum'] // professor['rating_count'] if professor['rating_count'] else 0,
+        }
+
     def get(self, request):
-        professors = Professor.objects.annotate(
-            average_rating=Avg('ratings__rating')
-        ).values('id', 'name', 'average_rating')
-        
-        for professor in professors:
-            professor['average_rating'] = int(professor['average_rating']) if professor['average_rating'] else 0
-        return Response(professors, status=status.HTTP_200_OK)
+        if reads_replica(Rating):
+            return self.list(request)
+        # Every write and delete replaces the version; max(updated_at) is
+        # read from its index, where a count would scan the table.
+        last_updated = Rating.objects.aggregate(last_updated=Max('updated_at'))['last_updated']
+        validator = f"{get_version(RATINGS)}:{last_updated}"
+        last_modified = max(filter(None, [last_updated, get_version_time(RATINGS)]))
+        return conditional_response(request, validator, last_modified, lambda: self.list(request))
+
+    def list(self, request):
+        professors = Professor.objects.values('id', 'name', 'rating_sum', 'rating_count')
+        if wants_stream(request):
+            professors = professors.using(professors.db)
+            return streaming_json_response(
+                self.professor_rating(professor)
+                for professor in professors.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            )
+
+        paginator = OptionalCursorPagination()
+        page = paginator.paginate_queryset(professors, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response([self.professor_rating(professor) for professor in page])
+
+        # Cache misses read the primary: a lagging replica must not be stored
+        # under a version that already covers the latest write.
+        data, hit = get_or_build(
+            RATINGS, 'professor-ratings',
+            lambda: [self.professor_rating(professor) for professor in professors.using(DEFAULT_DB_ALIAS)],
+        )
+        return Response(data, status=status.HTTP_200_OK, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+class CacheStatsView(APIView):
+    """Hit and miss counters of the response caches and the assignment index.
+
+    The counters are kept in memory by each worker, so they cover only the
+    requests of the worker that answers this one and restart with it.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({**cache_stats(), **assignment_index.stats()}, status=status.HTTP_200_OK)
+
+
+# Ratings Export View
+class RatingExportView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/jsonl; charset=utf-8'}
+
+    def get(self, request):
+        # Not ?format=, which DRF reserves for picking a renderer.
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return Response({"error": f"output must be one of {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        ratings = export_queryset(since or None)
+        # The rows are read after dispatch returns, so fix the database now.
+        ratings = ratings.using(ratings.db)
+        response = StreamingHttpResponse(export_ratings(ratings, fmt), content_type=self.content_types[fmt])
+        response['Content-Disposition'] = f'attachment; filename="ratings.{fmt}"'
+        return response
 
 
 # Professor Module Rating View
-class ProfessorModuleRatingView(APIView):
+class ProfessorModuleRatingView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, professor_id, module_code):
-        professor = get_object_or_404(Professor, id=professor_id)
-        module = get_object_or_404(Module, code=module_code)
-
-        ratings = Rating.objects.filter(professor=professor, module_instance__module=module)
-        avg_rating = ratings.aggregate(Avg('rating'))['rating__avg'] or 0
-
+        module_rating = ProfessorModuleRating.objects.select_related('professor', 'module').filter(
+            professor_id=professor_id, module__code=module_code
+        ).first()
+
+        if module_rating is None:
+            # No ratings yet for this pair, fall back to validating both ends.
+            professor = get_object_or_404(Professor, id=professor_id)
+            module = get_object_or_404(Module, code=module_code)
+            return self.rating_response(professor, module, 0)
+
+        if reads_replica(ProfessorModuleRating):
+            return self.rating_response(module_rating.professor, module_rating.module, module_rating.average_rating)
+
+        # The rollup row is as cheap as any validator, so it doubles as one.
+        validator = (
+            f"{get_version(CATALOGUE)}:{module_rating.rating_sum}:"
+            f"{module_rating.rating_count}:{module_rating.updated_at}"
+        )
+        last_modified = max(module_rating.updated_at, get_version_time(CATALOGUE))
+        return conditional_response(request, validator, last_modified, lambda: self.rating_response(
+            module_rating.professor, module_rating.module, module_rating.average_rating
+        ))
+
+    def rating_response(self, professor, module, avg_rating):
         return Response({
             "professor_id": professor.id,
             "professor_name": professor.name,
@@ -124,58 +268,97 @@ class ProfessorModuleRatingView(APIView):
 # Rate Professor View
 class RateProfessorView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = CreateRatingSerializer
 
+    @write_transaction
     def post(self, request):
-        serializer = CreateRatingSerializer(data=request.data, context={'request': request})
+        serializer = self.serializer_class(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save(user=request.user)
             return Response({"message": "Rating submitted successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Rate Professor By Module Code View
+class RateProfessorByCodeView(RateProfessorView):
+    serializer_class = CreateRatingByCodeSerializer
+
+
+# Batch Rate Professor View
+class RateProfessorBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 500
+
+    @write_transaction
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of ratings"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {"error": f"At most {self.max_batch_size} ratings per batch"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(request.data)
+        valid_indexes, valid_items = [], []
+        for index, item in enumerate(request.data):
+            serializer = BatchRatingItemSerializer(data=item)
+            if serializer.is_valid():
+                valid_indexes.append(index)
+                valid_items.append(serializer.validated_data)
+            else:
+                results[index] = {'status': 'error', 'errors': serializer.errors}
+
+        for index, result in zip(valid_indexes, submit_ratings(request.user, valid_items)):
+            results[index] = result
+
+        return Response(
+            [{'index': index, **result} for index, result in enumerate(results)],
+            status=status.HTTP_200_OK
+        )
+
 
 # Professor ViewSet
-class ProfessorViewSet(viewsets.ReadOnlyModelViewSet):
+class ProfessorViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Professor.objects.all()
     serializer_class = ProfessorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
 
 # Module Instance ViewSet
-class ModuleInstanceViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = ModuleInstance.objects.all()
+class ModuleInstanceViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ModuleInstance.objects.for_listing()
     serializer_class = ModuleInstanceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
 
 # Rating ViewSet
 class RatingViewSet(viewsets.ModelViewSet):
     serializer_class = RatingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RatingCursorPagination
     queryset = Rating.objects.all()
 
     def get_queryset(self):
-        return Rating.objects.filter(user=self.request.user)
+        return Rating.objects.filter(user=self.request.user).select_related('professor', 'module_instance__module')
 
+    @write_transaction
     def create(self, request, *args, **kwargs):
         serializer = CreateRatingSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            user = request.user
-            professor = serializer.validated_data['professor']
-            module_instance = serializer.validated_data['module_instance']
-
-            existing_rating = Rating.objects.filter(
-                user=user,
-                professor=professor,
-                module_instance=module_instance
-            ).first()
-
-            if existing_rating:
-                existing_rating.rating = serializer.validated_data['rating']
-                existing_rating.save()
+            serializer.save(user=request.user)
+            if not serializer.created:
                 return Response({"message": "Rating updated successfully"}, status=status.HTTP_200_OK)
-
-            serializer.save(user=user)
             return Response({"message": "Rating submitted successfully"}, status=status.HTTP_201_CREATED)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @write_transaction
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @write_transaction
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)